@@ -0,0 +1,162 @@
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_weights_hashes = {}  # (path, size, mtime) -> hash of the weights file
+
+
+def image_hash(image) -> str:
+    """
+    Hashes the content of an image file, or of an image already loaded into a numpy array.
+
+    :param: image: The image path, raw encoded bytes, or a decoded image array.
+    :type: image: str | bytes | np.ndarray
+    :return: The hex digest of the image content.
+    :rtype: str
+    """
+    h = hashlib.blake2b(digest_size=20)
+    if isinstance(image, np.ndarray):
+        h.update(str((image.shape, image.dtype.str)).encode())
+        h.update(np.ascontiguousarray(image).data)
+    elif isinstance(image, (bytes, bytearray, memoryview)):
+        h.update(image)
+    else:
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def weights_hash(path: str) -> str:
+    """
+    Hashes the content of a model weights file, recomputing it only if the file's size or mtime changed.
+
+    :param: path: The path of the weights file.
+    :type: path: str
+    :return: The hex digest of the weights file.
+    :rtype: str
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _weights_hashes:
+        _weights_hashes[key] = image_hash(path)
+    return _weights_hashes[key]
+
+
+def detection_key(image_digest: str, weights_digest: str, imgsz, conf_thres: float, iou_thres: float, max_det: int,
+                  backend: str) -> str:
+    """
+    Builds the cache key of the detections of an image, so that changing the image, the model weights, the inference
+    size, the NMS settings or the detector backend (e.g. the in-process ParkingDetector or detect.py's label files)
+    gives a different key.
+
+    :return: The cache key.
+    :rtype: str
+    """
+    return f"{backend}:{image_digest}:{weights_digest}:{tuple(imgsz)}:{conf_thres:g}:{iou_thres:g}:{max_det}"
+
+
+class DetectionCache:
+    """
+    Represents a cache of the detections and per-class counts of images: an in-memory LRU with an optional on-disk
+    SQLite tier, so unchanged camera images cost a hash instead of a forward pass.
+    """
+    def __init__(self, path: str | None = None, max_size: int = 1024):
+        self.path = path  # None keeps the cache in memory only
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS detections (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, value: dict):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> dict | None:
+        """
+        Returns the cached result of a key, or None if it is not cached.
+
+        :param: key: The cache key, as built by detection_key.
+        :type: key: str
+        :return: A copy of the cached dict, with the per-class 'counts' ({class index: count}) and the 'detections' (a
+                 list of [x1, y1, x2, y2, conf, cls] boxes in original image pixels, or None if they weren't stored).
+        :rtype: dict or None
+        """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(value)  # callers may modify the result, the cached entry must stay intact
+
+            if self.path is not None:
+                row = self._connect().execute("SELECT value FROM detections WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    value["counts"] = {int(c): n for c, n in value["counts"].items()}
+                    self._remember(key, value)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+            self.misses += 1
+            return None
+
+    def set(self, key: str, counts: dict, detections: list | None = None):
+        """
+        Stores the result of an image in both tiers of the cache.
+
+        :param: key: The cache key, as built by detection_key.
+        :type: key: str
+        :param: counts: The number of detections of each class index.
+        :type: counts: dict
+        :param: detections: The [x1, y1, x2, y2, conf, cls] boxes of the image, if available.
+        :type: detections: list or None
+        :return: None
+        :rtype: None
+        """
+        value = {"counts": dict(counts), "detections": copy.deepcopy(detections)}
+        with self._lock:
+            self._remember(key, value)
+            if self.path is not None:
+                db = self._connect()
+                db.execute("INSERT OR REPLACE INTO detections (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+                db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detection_cache(**kwargs) -> DetectionCache:
+    """
+    Returns the process-wide detection cache, creating it on first use.
+
+    :param: kwargs: Arguments passed to DetectionCache when it is created (e.g. path to enable the on-disk tier).
+    :return: The shared detection cache.
+    :rtype: DetectionCache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DetectionCache(**kwargs)
+        return _cache
@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+
+import geocache
+import locations as loc
+
+WORKERS = 4
+QUEUE_SIZE = 32
+COALESCE_RADIUS = 0.2  # km between two destinations that are served by the same pipeline run
+COALESCE_WINDOW = 30  # seconds after a run started during which new requests can join it
+
+
+class Job:
+    """
+    Represents one run of the pipeline for a destination, and the chats waiting for its answer.
+    """
+    def __init__(self, address: str, chat_id):
+        self.address = address
+        self.key = geocache.address_key(address)
+        self.chat_ids = [chat_id]
+        self.created = time.time()
+        self.started = None  # time a worker started running the job, None while it is queued
+        self.location = None
+        self.done = False
+
+
+class RequestDispatcher:
+    """
+    Represents a bounded queue of address requests served by a pool of worker threads, so a slow request doesn't
+    block the bot's other users.
+
+    Requests for the same address, or for destinations within COALESCE_RADIUS of each other, are coalesced while the
+    first run is queued or during the COALESCE_WINDOW seconds after it started: the pipeline runs once and every
+    waiting chat gets the answer. When the queue is full, submit refuses the request so the bot can reply that it is
+    busy.
+    """
+    def __init__(self, handler, reply, workers: int = WORKERS, max_queue: int = QUEUE_SIZE,
+                 coalesce_radius: float = COALESCE_RADIUS, coalesce_window: float = COALESCE_WINDOW):
+        self.handler = handler  # handler(address) -> result, e.g. manager.manager
+        self.reply = reply  # reply(chat_id, result, error) where error is the exception raised by the handler or None
+        self.coalesce_radius = coalesce_radius
+        self.coalesce_window = coalesce_window
+        self.coalesced = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = []  # queued and running jobs
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, name=f'dispatcher-{i}', daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def _joinable(self, job: Job, now: float) -> bool:
+        # A queued job can always be joined, a running one only within the coalescing window of its run start
+        return not job.done and (job.started is None or now - job.started <= self.coalesce_window)
+
+    def submit(self, chat_id, address: str) -> bool:
+        """
+        Queues an address request of a chat, or attaches the chat to a pending run for the same address.
+
+        :param: chat_id: The chat to send the answer to.
+        :param: address: The destination address.
+        :type: address: str
+        :return: False if the queue is full and the request was refused, True otherwise.
+        :rtype: bool
+        """
+        job = Job(address, chat_id)
+        with self._lock:
+            for pending in self._jobs:
+                if pending.key == job.key and self._joinable(pending, job.created):
+                    pending.chat_ids.append(chat_id)
+                    self.coalesced += 1
+                    return True
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                return False
+            self._jobs.append(job)
+        return True
+
+    def _merge_nearby(self, job: Job) -> bool:
+        # Geocoding goes through the geocoding cache, so the handler's own lookup of the address is free
+        try:
+            coordinates = loc.get_lat_long(job.address)
+        except Exception as e:  # the job can still run on its own, and report its own errors
+            print(f"Failed to geocode {job.address} for coalescing. Error: {e}")
+            return False
+        with self._lock:
+            if coordinates is not None:
+                for running in self._jobs:
+                    if running is job or running.location is None or not self._joinable(running, job.created):
+                        continue
+                    if loc.get_distance(running.location, loc.Location(*coordinates)) <= self.coalesce_radius:
+                        running.chat_ids.extend(job.chat_ids)
+                        self.coalesced += len(job.chat_ids)
+                        job.done = True
+                        self._jobs.remove(job)
+                        return True
+                job.location = loc.Location(*coordinates)
+        return False
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.started = time.time()
+            merged, result, error = False, None, None
+            try:
+                merged = self._merge_nearby(job)
+                if not merged:
+                    result = self.handler(job.address)
+            except Exception as e:
+                error = e
+            if not merged:
+                with self._lock:
+                    job.done = True  # no chat can join after this point
+                    self._jobs.remove(job)
+                for chat_id in job.chat_ids:
+                    try:
+                        self.reply(chat_id, result, error)
+                    except Exception as e:
+                        print(f"Failed to reply to chat {chat_id}. Error: {e}")
+            self._queue.task_done()
+
+    def join(self):
+        """
+        Blocks until every queued request was served.
+
+        :return: None
+        :rtype: None
+        """
+        self._queue.join()
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import itertools
+import time
+
+import aiohttp
+from aiohttp import web
+from telebot import asyncio_helper
+
+ADDRESSES = ["1151 Centre Street Southeast, Calgary AB", "800 Macleod Trail SE, Calgary AB",
+             "333 7 Ave SW, Calgary AB", "225 7 Ave SW, Calgary AB"]
+
+
+def fake_update(update_id: int, chat_id: int, text: str) -> dict:
+    """
+    Builds the JSON of a Telegram update with a private text message, as Telegram posts it to the webhook.
+
+    :param: update_id: The id of the update.
+    :type: update_id: int
+    :param: chat_id: The id of the chat (and of its user).
+    :type: chat_id: int
+    :param: text: The text of the message.
+    :type: text: str
+    :return: The update.
+    :rtype: dict
+    """
+    update = {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+            "text": text,
+        },
+    }
+    if text.startswith("/"):
+        update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return update
+
+
+def fake_updates(chats: int, addresses=ADDRESSES, start_id: int = 1):
+    """
+    Generates the '/start' and 'address: ...' updates of many chats, each chat asking for one of the addresses.
+
+    :param: chats: The number of chats.
+    :type: chats: int
+    :param: addresses: The addresses the chats ask for, in turn.
+    :type: addresses: list of str
+    :param: start_id: The id of the first update.
+    :type: start_id: int
+    :return: A generator of updates.
+    """
+    update_ids = itertools.count(start_id)
+    for chat_id, address in zip(range(1, chats + 1), itertools.cycle(addresses)):
+        yield fake_update(next(update_ids), chat_id, "/start")
+        yield fake_update(next(update_ids), chat_id, "address: " + address)
+
+
+async def post_updates(url: str, updates, concurrency: int = 100, secret_token: str | None = None) -> list:
+    """
+    Posts updates to a webhook concurrently, like Telegram does with many active chats.
+
+    :param: url: The URL of the webhook.
+    :type: url: str
+    :param: updates: The updates to post.
+    :param: concurrency: The number of updates posted at the same time.
+    :type: concurrency: int
+    :param: secret_token: The secret token of the webhook, if it has one.
+    :type: secret_token: str or None
+    :return: The HTTP status and the latency in seconds of each post.
+    :rtype: list of tuple
+    """
+    headers = {} if secret_token is None else {"X-Telegram-Bot-Api-Secret-Token": secret_token}
+    limit = asyncio.Semaphore(concurrency)
+
+    async def post(session, update):
+        async with limit:
+            start = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                return response.status, time.perf_counter() - start
+
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(post(session, update) for update in updates))
+
+
+class FakeBotApi:
+    """
+    Represents a local stand-in for the Telegram Bot API that answers every method call and records the messages the
+    async bot sends, so the webhook front-end can be run without reaching Telegram.
+
+    Usage:
+        api = FakeBotApi()
+        await api.start()  # the async bot now calls the fake API
+        ...
+        print(api.sent)
+        await api.stop()
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.sent = []  # (method, chat_id, text) of every call
+        self._runner = None
+        self._previous_url = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        data = dict(await request.post()) or dict(request.query)
+        chat_id = int(data.get('chat_id', 0))
+        self.sent.append((method, chat_id, data.get('text')))
+        message = {"message_id": len(self.sent), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+                   "text": data.get('text')}
+        return web.json_response({"ok": True, "result": message if method.startswith('send') else True})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]  # the port picked by the OS when port is 0
+        self._previous_url = asyncio_helper.API_URL
+        asyncio_helper.API_URL = f"http://{self.host}:{self.port}/bot{{0}}/{{1}}"
+
+    async def stop(self):
+        asyncio_helper.API_URL = self._previous_url
+        await self._runner.cleanup()
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8080/webhook', help='URL of the webhook')
+    parser.add_argument('--chats', type=int, default=200, help='number of chats')
+    parser.add_argument('--concurrency', type=int, default=100, help='updates posted at the same time')
+    parser.add_argument('--secret-token', default=None, help='secret token of the webhook')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    results = asyncio.run(post_updates(opt.url, fake_updates(opt.chats), opt.concurrency, opt.secret_token))
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(status != 200 for status, _ in results)
+    print(f"{len(results)} updates posted, {errors} errors, "
+          f"median {latencies[len(latencies) // 2] * 1E3:.1f}ms, max {latencies[-1] * 1E3:.1f}ms")
@@ -0,0 +1,33 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def get_distances(latitudes1, longitudes1, latitudes2, longitudes2, matrix: bool = False) -> np.ndarray:
+    """
+    Calculates the Haversine distances between locations on Earth in a single vectorized pass.
+
+    The inputs are broadcast against each other, so a scalar origin with arrays of destinations gives the distance
+    from the origin to each destination, and two arrays of equal length give the pairwise distances. With matrix=True
+    the result is the full distance matrix between every location of the first set and every location of the second.
+
+    :param: latitudes1: Latitude or latitudes of the first locations in decimal degrees.
+    :type: latitudes1: float or array-like
+    :param: longitudes1: Longitude or longitudes of the first locations in decimal degrees.
+    :type: longitudes1: float or array-like
+    :param: latitudes2: Latitude or latitudes of the second locations in decimal degrees.
+    :type: latitudes2: float or array-like
+    :param: longitudes2: Longitude or longitudes of the second locations in decimal degrees.
+    :type: longitudes2: float or array-like
+    :param: matrix: Whether to return the (len(first) x len(second)) distance matrix.
+    :type: matrix: bool
+    :return: The distances between the locations in kilometers.
+    :rtype: np.ndarray
+    """
+    lat1, lon1 = np.radians(latitudes1), np.radians(longitudes1)
+    lat2, lon2 = np.radians(latitudes2), np.radians(longitudes2)
+    if matrix:
+        lat1, lon1 = np.atleast_1d(lat1)[:, None], np.atleast_1d(lon1)[:, None]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
@@ -0,0 +1,138 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_PATH = 'geocoding_cache.sqlite'
+DEFAULT_TTL = 30 * 24 * 60 * 60  # 30 days, in seconds
+
+
+def address_key(address: str) -> str:
+    """
+    Builds the cache key of a forward geocoding request, so addresses that differ only in case or whitespace share it.
+
+    :param: address: The address that is geocoded.
+    :type: address: str
+    :return: The cache key.
+    :rtype: str
+    """
+    return "address:" + " ".join(address.lower().replace(",", ", ").split())
+
+
+def location_key(latitude: float, longitude: float, digits: int = 5) -> str:
+    """
+    Builds the cache key of a reverse geocoding request from coordinates rounded to the given number of digits.
+
+    :param: latitude: The latitude in decimal degrees.
+    :type: latitude: float
+    :param: longitude: The longitude in decimal degrees.
+    :type: longitude: float
+    :param: digits: The number of decimal digits to keep (5 digits is about 1 meter).
+    :type: digits: int
+    :return: The cache key.
+    :rtype: str
+    """
+    return f"latlng:{round(float(latitude), digits):.{digits}f},{round(float(longitude), digits):.{digits}f}"
+
+
+class GeocodingCache:
+    """
+    Represents a two-tier cache of geocoding results: an in-memory LRU in front of an on-disk SQLite store, where
+    every entry expires after the configured time to live.
+    """
+    def __init__(self, path: str | None = CACHE_PATH, ttl: float = DEFAULT_TTL, max_size: int = 4096):
+        self.path = path  # None keeps the cache in memory only
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS geocoding "
+                             "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, value, expires: float):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """
+        Returns the cached value of a key, or None if it is not cached or has expired.
+
+        :param: key: The cache key, as built by address_key or location_key.
+        :type: key: str
+        :return: The cached value, or None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            if self.path is not None:
+                row = self._connect().execute("SELECT value, expires FROM geocoding WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value):
+        """
+        Stores a JSON-serializable value in both tiers of the cache.
+
+        :param: key: The cache key, as built by address_key or location_key.
+        :type: key: str
+        :param: value: The value to cache.
+        :return: None
+        :rtype: None
+        """
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires)
+            if self.path is not None:
+                db = self._connect()
+                db.execute("INSERT OR REPLACE INTO geocoding (key, value, expires) VALUES (?, ?, ?)",
+                           (key, json.dumps(value), expires))
+                db.commit()
+
+    def clear(self):
+        """
+        Removes every entry from both tiers of the cache and resets the hit/miss counters.
+
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self._memory.clear()
+            if self.path is not None:
+                db = self._connect()
+                db.execute("DELETE FROM geocoding")
+                db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters of the cache.
+
+        :return: The number of hits and misses, and the hit rate.
+        :rtype: dict
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
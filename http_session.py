@@ -0,0 +1,78 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PooledSession:
+    """
+    Represents a keep-alive HTTP session with bounded per-host connection pools, request timeouts and exponential
+    backoff retries on 5xx/429 responses, that records the latency and errors of every endpoint it calls.
+    """
+    def __init__(self, timeout=(3.05, 10), retries: int = 3, backoff_factor: float = 0.3, pool_connections: int = 4,
+                 pool_maxsize: int = 16):
+        self.timeout = timeout  # (connect, read) in seconds
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=frozenset({"GET"}), respect_retry_after_header=True, raise_on_status=False)
+        # pool_maxsize bounds the open connections per host, and pool_block makes extra requests wait for one
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry,
+                              pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _record(self, endpoint: str, seconds: float, error: bool):
+        with self._lock:
+            metrics = self._metrics.setdefault(endpoint, {"requests": 0, "errors": 0, "total_time": 0.0,
+                                                          "max_time": 0.0})
+            metrics["requests"] += 1
+            metrics["errors"] += error
+            metrics["total_time"] += seconds
+            metrics["max_time"] = max(metrics["max_time"], seconds)
+
+    def get(self, url: str, params: dict | None = None) -> requests.Response:
+        """
+        Sends a GET request through the pooled session, retrying it on connection errors and 5xx/429 responses.
+
+        :param: url: The URL of the endpoint.
+        :type: url: str
+        :param: params: The query parameters of the request.
+        :type: params: dict or None
+        :return: The response of the last attempt.
+        :rtype: requests.Response
+        :raises requests.RequestException: If the request still fails after all the retries.
+        """
+        endpoint = urlparse(url).path
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException:
+            self._record(endpoint, time.perf_counter() - start, True)
+            raise
+        self._record(endpoint, time.perf_counter() - start, response.status_code >= 400)
+        return response
+
+    def metrics(self) -> dict:
+        """
+        Returns the request count, error count and latency (in seconds) of every endpoint called so far.
+
+        :return: The metrics of each endpoint, keyed by the URL path.
+        :rtype: dict
+        """
+        with self._lock:
+            return {endpoint: dict(m, mean_time=m["total_time"] / m["requests"]) for endpoint, m in
+                    self._metrics.items()}
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,212 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = 'image_cache'
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+INDEX_FILE = 'index.json'
+
+
+class LocalBlob:
+    """
+    Represents a file of a LocalBucket, with the metadata attributes of a Firebase storage blob that the fetcher uses.
+    The version of the file comes from its stat alone, so checking whether it changed never reads its content.
+    """
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        stat = os.stat(path)
+        self.generation = f"{stat.st_mtime_ns}-{stat.st_size}"  # changes whenever the file is rewritten
+        self.size = stat.st_size
+        self.md5_hash = None  # hashing the content would read the whole file on every metadata check
+
+    def download_to_filename(self, filename):
+        with open(self.path, 'rb') as src, open(filename, 'wb') as dst:
+            dst.write(src.read())
+
+
+class LocalBucket:
+    """
+    Represents a local directory that stands in for the Firebase storage bucket, so the fetcher can run offline.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def get_blob(self, name):
+        path = os.path.join(self.path, name)
+        return LocalBlob(path, name) if os.path.isfile(path) else None
+
+
+class ImageFetcher:
+    """
+    Represents a concurrent fetcher of the snapshot images from the storage bucket, that keeps the images in a local
+    on-disk cache keyed by blob name and version (generation and md5), downloads a blob only if it changed since the
+    last fetch, and evicts the least recently used images once the cache grows beyond its size budget.
+    """
+    def __init__(self, bucket=None, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 max_workers: int = 8):
+        self._bucket = bucket  # the default Firebase bucket is looked up on first use
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.downloads = 0
+        self.hits = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._pins = Counter()  # blob name -> number of requests using its cached image
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()  # blob name -> {"version", "size", "used"}
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            from firebase_admin import storage  # only needed without a bucket, e.g. not with a LocalBucket
+            self._bucket = storage.bucket()
+        return self._bucket
+
+    def _load_index(self) -> dict:
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {name: entry for name, entry in index.items() if os.path.exists(self.path_of(name))}
+
+    def _save_index(self):
+        tmp_path = os.path.join(self.cache_dir, INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, os.path.join(self.cache_dir, INDEX_FILE))
+
+    def path_of(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def fetch_one(self, name: str) -> str:
+        """
+        Makes sure the latest version of a blob is in the cache, downloading it only if it changed.
+
+        :param: name: The name of the blob in the bucket.
+        :type: name: str
+        :return: The local path of the cached image.
+        :rtype: str
+        :raises FileNotFoundError: If the blob does not exist in the bucket.
+        """
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            raise FileNotFoundError(f"{name} was not found in the bucket")
+        version = f"{blob.generation}:{blob.md5_hash}"
+        path = self.path_of(name)
+
+        with self._lock:
+            entry = self._index.get(name)
+            cached = entry is not None and entry["version"] == version and os.path.exists(path)
+            if cached:
+                entry["used"] = time.time()
+                self.hits += 1
+        if cached:
+            return path
+
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        blob.download_to_filename(tmp_path)
+        os.replace(tmp_path, path)  # readers never see a partially written image
+        with self._lock:
+            self._index[name] = {"version": version, "size": os.path.getsize(path), "used": time.time()}
+            self.downloads += 1
+        return path
+
+    def fetch(self, names: list) -> list:
+        """
+        Fetches many blobs concurrently through the thread pool and evicts the least recently used images if the
+        cache is over its size budget.
+
+        :param: names: The names of the blobs in the bucket.
+        :type: names: list of str
+        :return: The local paths of the cached images, in the same order as the names.
+        :rtype: list of str
+        :raises FileNotFoundError: If a blob does not exist in the bucket.
+        """
+        paths = list(self._pool.map(self.fetch_one, names))
+        self.evict(keep=set(names))
+        return paths
+
+    def pin(self, names: list):
+        """
+        Protects the cached images of the given blobs from eviction until they are released, so a request can read
+        them while concurrent requests evict other images.
+
+        :param: names: The names of the blobs in the bucket.
+        :type: names: list of str
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self._pins.update(names)
+
+    def release(self, names: list):
+        with self._lock:
+            self._pins.subtract(names)
+            self._pins = +self._pins  # drop the names that are no longer pinned
+
+    @contextlib.contextmanager
+    def checkout(self, names: list):
+        """
+        Fetches the blobs and keeps their cached images pinned until the block exits.
+
+        Usage:
+            with fetcher.checkout(names) as paths:
+                detector.count(paths)
+
+        :param: names: The names of the blobs in the bucket.
+        :type: names: list of str
+        :return: A context manager yielding the local paths of the cached images, in the same order as the names.
+        """
+        self.pin(names)
+        try:
+            yield self.fetch(names)
+        finally:
+            self.release(names)
+
+    def evict(self, keep: set = frozenset()):
+        """
+        Deletes the least recently used images until the cache fits its size budget, and saves the cache index.
+
+        :param: keep: Names of blobs that must not be evicted, in addition to the pinned ones.
+        :type: keep: set
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            total = sum(entry["size"] for entry in self._index.values())
+            for name in sorted(self._index, key=lambda n: self._index[n]["used"]):
+                if total <= self.max_bytes:
+                    break
+                if name in keep or name in self._pins:
+                    continue
+                total -= self._index.pop(name)["size"]
+                try:
+                    os.remove(self.path_of(name))
+                except OSError as e:
+                    print(f"Failed to delete file: {self.path_of(name)}. Error: {e}")
+            self._save_index()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher(**kwargs) -> ImageFetcher:
+    """
+    Returns the process-wide image fetcher, creating it on first use.
+
+    :param: kwargs: Arguments passed to ImageFetcher when it is created.
+    :return: The shared image fetcher.
+    :rtype: ImageFetcher
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ImageFetcher(**kwargs)
+        return _fetcher
@@ -1,15 +1,26 @@
 import APIs
-import requests
 from math import radians, sin, cos, sqrt, atan2
-import pandas as pd
-import csv
-import json
 import datetime
+import os
+
+import requests
+
+import geocache
+from geo import EARTH_RADIUS_KM, get_distances
+import parking_dataset
+from http_session import PooledSession
 
 YOUR_API_KEY = APIs.MapsKey
+MAPS_API_URL = os.environ.get("MAPS_API_URL", "https://maps.googleapis.com/maps/api")  # overridden by the stub server
+DISTANCE_MATRIX_MAX_ORIGINS = 25  # Distance Matrix API limit of origins per request
+
+geocoding_cache = geocache.GeocodingCache()
+maps_session = PooledSession()  # shared by every Google Maps call
 
 
 class Location:
+    __slots__ = ('latitude', 'longitude')
+
     def __init__(self, latitude, longitude):
         self.latitude = latitude
         self.longitude = longitude
@@ -38,7 +49,7 @@ def get_distance(location1: Location, location2: Location) -> float:
     dlon = lon2 - lon1
     a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    distance = 6371 * c  # Earth radius in km
+    distance = EARTH_RADIUS_KM * c
 
     return distance
 
@@ -53,17 +64,24 @@ def get_address(location: Location) -> str | None:
     :return: The formatted address of the location, or None if an error occurs or no address is found.
     :rtype: str or None
     """
+    cache_key = geocache.location_key(location.latitude, location.longitude)
+    cached = geocoding_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     # Define the API endpoint and parameters
-    endpoint = "https://maps.googleapis.com/maps/api/geocode/json"
+    endpoint = f"{MAPS_API_URL}/geocode/json"
     params = {"latlng": f"{location.latitude},{location.longitude}", "key": YOUR_API_KEY }
 
     # Send a GET request to the API endpoint
-    response = requests.get(endpoint, params=params)
+    response = maps_session.get(endpoint, params=params)
 
     # Parse the response JSON and extract the formatted address
     data = response.json()
     if data["status"] == "OK":
-        return data["results"][0]["formatted_address"]
+        address = data["results"][0]["formatted_address"]
+        geocoding_cache.set(cache_key, address)
+        return address
     else:
         return None
 
@@ -72,14 +90,19 @@ def get_lat_long(location: str) -> tuple | None:
     """
     Given a location address, returns its latitude and longitude using Google Maps Geocoding API.
     """
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
+    cache_key = geocache.address_key(location)
+    cached = geocoding_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    url = f"{MAPS_API_URL}/geocode/json"
     params = {
         "address": location,
         "key": YOUR_API_KEY
     }
 
     # Send GET request to the API endpoint with the parameters
-    response = requests.get(url, params=params)
+    response = maps_session.get(url, params=params)
 
     # Check if the API request was successful
     if response.status_code == 200:
@@ -90,6 +113,7 @@ def get_lat_long(location: str) -> tuple | None:
             # Get the latitude and longitude from the first result
             lat = data["results"][0]["geometry"]["location"]["lat"]
             lng = data["results"][0]["geometry"]["location"]["lng"]
+            geocoding_cache.set(cache_key, [lat, lng])
             return lat, lng
 
     # If the API request was not successful, return None
@@ -108,7 +132,7 @@ def get_travel_time(origin: str, destination: str) -> float:
         :return: The estimated travel time between the origin and destination in minutes, or -1 if an error occurs.
         :rtype: float
         """
-    url = "https://maps.googleapis.com/maps/api/directions/json"
+    url = f"{MAPS_API_URL}/directions/json"
 
     params = {
         "origin": origin,
@@ -117,7 +141,7 @@ def get_travel_time(origin: str, destination: str) -> float:
     }
 
     # Send GET request to the API endpoint with the parameters
-    response = requests.get(url, params=params)
+    response = maps_session.get(url, params=params)
 
     # Check if the API request was successful
     if response.status_code == 200:
@@ -136,30 +160,78 @@ def get_travel_time(origin: str, destination: str) -> float:
         return -1
 
 
+def get_travel_times(origins: list, destination: str) -> list:
+    """
+    Retrieves the estimated travel times from many origin locations to a single destination address using the Google
+    Maps Distance Matrix API in minutes.
+
+    The origins are sent as coordinates, so no reverse geocoding is needed, and are split into as few requests as the
+    API's limit of origins per request allows.
+
+    :param: origins: The origin locations for the travel time calculation.
+    :type: origins: list of Location
+    :param: destination: The destination address for the travel time calculation.
+    :type: destination: str
+    :return: The estimated travel time from each origin to the destination in minutes, in the same order as the
+             origins, with None for every origin whose travel time could not be retrieved (an element without a route,
+             or a request that failed or was refused, e.g. with OVER_QUERY_LIMIT).
+    :rtype: list of float or None
+    """
+    url = f"{MAPS_API_URL}/distancematrix/json"
+    travel_times = []
+    for start in range(0, len(origins), DISTANCE_MATRIX_MAX_ORIGINS):
+        chunk = origins[start:start + DISTANCE_MATRIX_MAX_ORIGINS]
+        params = {
+            "origins": "|".join(f"{origin.latitude},{origin.longitude}" for origin in chunk),
+            "destinations": destination,
+            "key": YOUR_API_KEY
+        }
+
+        chunk_times = [None] * len(chunk)
+        try:
+            # Send GET request to the API endpoint with the parameters
+            response = maps_session.get(url, params=params)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve the travel times of {len(chunk)} origins. Error: {e}")
+            travel_times.extend(chunk_times)
+            continue
+
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("status") == "OK":
+                # Every row holds the single element of one origin to the destination
+                for i, row in enumerate(data["rows"][:len(chunk)]):
+                    element = row["elements"][0]
+                    if element["status"] == "OK":
+                        chunk_times[i] = element["duration"]["value"] / 60  # convert seconds to minutes
+        travel_times.extend(chunk_times)
+
+    return travel_times
+
+
 def values_from_ds(target_latitude: float, target_longitude: float) -> float | int:
     """
-    Retrieves values from a CSV data source for a target latitude and longitude.
+    Retrieves values from the in-memory parking dataset for a target latitude and longitude.
 
     :param: target_latitude: The target latitude for filtering the data.
     :type: target_latitude: float
     :param: target_longitude: The target longitude for filtering the data.
     :type: target_longitude: float
-    :return: The filtered results from the CSV data source as a float value for 'AvgTimeToPark', and the result of
-             calling 'get_searching_by_hour' function on 'AvgTimeToPark' index as an integer value.
+    :return: The 'AvgTimeToPark' value of the matching row as a float, and the result of calling
+             'get_searching_by_hour' function on the matching row number.
     :rtype: float | int
     """
-    # Load the CSV data into a pandas DataFrame
-    df = pd.read_csv('Searching_for_parking.csv')
-
-    # Use boolean indexing to filter rows that match the target latitude and longitude
-    filtered_df = df[(df['Latitude_SW'] == target_latitude) & (df['Longitude_SW'] == target_longitude)]
-    # return the filtered results
-    return float(filtered_df['AvgTimeToPark']), get_searching_by_hour(int(filtered_df['AvgTimeToPark'].index.to_numpy()))
+    dataset = parking_dataset.get_dataset()
+    row_num = dataset.row_of(target_latitude, target_longitude)
+    if row_num is None:
+        raise KeyError(f"No dataset row for ({target_latitude}, {target_longitude})")
+    # Both values come from the same dataset, even if it is reloaded in between
+    return float(dataset.avg_time_to_park[row_num]), dataset.searching_at(row_num, datetime.datetime.now().hour)
 
 
 def get_searching_by_hour_test(hour: int, row_num: int) -> int | None:
     """
-    Retrieves the value of 'SearchingByHour' for a specific hour from a CSV data source for a given row number.
+    Retrieves the value of 'SearchingByHour' for a specific hour from the parking dataset for a given row number.
 
     :param: hour: The hour for which the 'SearchingByHour' value is retrieved.
     :type: hour: int
@@ -168,37 +240,23 @@ def get_searching_by_hour_test(hour: int, row_num: int) -> int | None:
     :return: The value of 'SearchingByHour' for the specified hour, or None if the hour is not found.
     :rtype: Any
     """
-    with open('Searching_for_parking.csv', 'r') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-        for i, row in enumerate(reader):
-            if i == row_num:
-                searching_by_hour = json.loads(row[header.index('SearchingByHour')])
-                if hour in searching_by_hour:
-                    return searching_by_hour[hour]
-                else:
-                    return None
+    dataset = parking_dataset.get_dataset()
+    if not 0 <= row_num < len(dataset):
         return None
+    return dataset.searching_at(row_num, int(hour))
 
 
 def get_searching_by_hour(row_num: int) -> float | None:
     """
-    Retrieves the value of 'SearchingByHour' for the current hour from a CSV data source for a given row number.
+    Retrieves the value of 'SearchingByHour' for the current hour from the parking dataset for a given row number.
 
     :param: row_num: The row number of the CSV data source to retrieve the value from.
     :type: row_num: int
     :return: The value of 'SearchingByHour' for the current hour, or None if the hour is not found.
     :rtype: float or None
     """
-    current_hour = str(datetime.datetime.now().hour)
-    with open('Searching_for_parking.csv', 'r') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-        for i, row in enumerate(reader):
-            if i == row_num:
-                searching_by_hour = json.loads(row[header.index('SearchingByHour')])
-                if current_hour in searching_by_hour:
-                    return searching_by_hour[current_hour]
-                else:
-                    return None
+    current_hour = datetime.datetime.now().hour
+    dataset = parking_dataset.get_dataset()
+    if not 0 <= row_num < len(dataset):
         return None
+    return dataset.searching_at(row_num, current_hour)
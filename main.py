@@ -9,6 +9,9 @@ from sympy.strategies.core import switch
 
 import APIs
 import manager
+from dispatcher import RequestDispatcher
+import occupancy
+import yolo_funcs
 
 #for the bot
 Telegram_Bot_API_TOKEN = APIs.Telegram_Bot_API_TOKEN
@@ -17,6 +20,9 @@ Telegram_Bot_API_TOKEN = APIs.Telegram_Bot_API_TOKEN
 if __name__ == '__main__':
     cred = credentials.Certificate("./key.json")
     app = firebase_admin.initialize_app(cred, {'storageBucket': 'final-project-cb673.appspot.com'})
+    yolo_funcs.get_detector()  # load the YOLOv5 weights once, before serving requests
+    manager.get_camera_index()
+    occupancy.OccupancyDaemon().start()  # keep the occupancy table of every camera fresh in the background
 
     # If you want to use it with console:
 
@@ -47,16 +53,27 @@ if __name__ == '__main__':
 
     bot = telebot.TeleBot(Telegram_Bot_API_TOKEN)
 
+    def reply(chat_id, best_address, error):
+        if error is not None:
+            print(f"Failed to find a parking for chat {chat_id}. Error: {error}")
+            bot.send_message(chat_id, "Sorry, something went wrong while searching for a parking. Please try again.")
+            return
+        bot.send_message(chat_id, "The best parking for you available in: " + str(best_address))
+
+    # Address requests are served by a pool of workers, so a slow search doesn't block the polling thread
+    dispatcher = RequestDispatcher(manager.manager, reply)
+
     @bot.message_handler(commands=["start"])
     def start(message):
         bot.send_message(message.chat.id, "Hello! I am the telegram bot. \nTo get started - send an address:")
 
-        @bot.message_handler(func=lambda message: message.text.startswith("address: "))
-        def greet(message):
-            address_from_bot = message.text[9:]
-            bot.send_message(message.chat.id, "We are searchig for the best parking for you..... Please wait.  ")
-            bot.send_animation(message.chat.id, "https://media.tenor.com/7NX24XoJX0MAAAAM/loading-fast.gif")
-            text = "The best parking for you available in: "+ str(manager.manager(address_from_bot))
-            bot.send_message(message.chat.id, text)
+    @bot.message_handler(func=lambda message: message.text is not None and message.text.startswith("address: "))
+    def greet(message):
+        address_from_bot = message.text[9:]
+        # Acknowledge before submitting, a coalesced or quick search can answer before this handler returns
+        bot.send_message(message.chat.id, "We are searchig for the best parking for you..... Please wait.  ")
+        bot.send_animation(message.chat.id, "https://media.tenor.com/7NX24XoJX0MAAAAM/loading-fast.gif")
+        if not dispatcher.submit(message.chat.id, address_from_bot):
+            bot.send_message(message.chat.id, "The bot is busy right now. Please try again in a minute.")
 
-    bot.polling()
\ No newline at end of file
+    bot.polling()
@@ -1,59 +1,192 @@
+import asyncio
 import csv
 import glob
 import os
 
+import numpy as np
+
+import image_fetcher
 import locations as loc
-from snapshot import Snapshot
+import occupancy
+import parking_dataset
+import scoring
+from snapshot import Snapshot, SnapshotTable
 from locations import Location
+from spatial_index import GridIndex
 import yolo_funcs
 import firebase_admin
 from firebase_admin import storage, credentials
 
+MAX_TRAVEL_SPEED_KMH = 130  # no route beats the straight line at this speed, a lower bound of the travel time
+RANKING_BATCH_SIZE = 8  # snapshots whose travel times are retrieved in one Distance Matrix request while ranking
+
+_camera_index = None
+
 
-def manager(address: str):
+def manager(address: str, radius: float = 1):
     """
       Manages the process of finding the best parking spot near the given address.
 
       This function takes an address as input and performs a series of tasks to find the best parking spot near the given
       address. It first uses a function to retrieve the latitude and longitude coordinates of the given address. Then, it
-      uses these coordinates to generate an array of snapshots of the area within a 1000-meter radius. The function
-      copies the good photos from this array to another folder. Next, it runs a YOLOv5 function to detect the number of
-      available parking slots in each snapshot. It then runs a function to grade each snapshot based on its suitability
-      for parking. The function keeps track of the snapshot with the highest grade and updates the best snapshot and its
-      grade accordingly. Finally, the function translates the location of the best snapshot to an address and prints it
-      to the console.
+      uses these coordinates to generate an array of snapshots of the area within the given radius. The available
+      parking slots of each snapshot are taken from the occupancy table when its camera was detected recently, and the
+      remaining snapshots are downloaded and counted by the in-memory YOLOv5 detector. The snapshots are then ranked by
+      `rank_snaps`, which grades them based on their suitability for parking and only retrieves the travel times of the
+      snapshots that can still beat the best grade found so far. Finally, the function translates the location of the
+      best snapshot to an address and prints and returns it.
 
       :param: address: The address for which to find the best parking spot.
       :type: address: str
-      :return: None
-      :rtype: None
+      :param: radius: The search radius around the address in kilometers.
+      :type: radius: float
+      :return: The address of the best parking spot, or None if no parking spot was found.
+      :rtype: str or None
       """
     lat, lng = loc.get_lat_long(address)
     dest_loc = Location(lat, lng)
-    snaps_arr = create_arr(dest_loc)
-    download_relevant_imgs(snaps_arr)
-    best_snap = None
-    best_grade = 0
-    yolo_funcs.run_yolov5()
-    for snap in snaps_arr:
-        print()
-        snap.available_slots = yolo_funcs.get_parking_num(snap.name)
-        print("available parking slots: ", snap.available_slots)
-        print("snap after update available: ", snap)
-        snap_grade = gradeSnap(address, snap)
-        print("the snap grade is: ", snap_grade)
-        if best_grade < snap_grade:
-            best_snap = snap
-            best_grade = snap_grade
+    snaps_arr = create_arr(dest_loc, radius)
+    stale = use_occupancy(snaps_arr)
+    if len(stale):  # only run live detection on cameras the occupancy daemon hasn't detected recently
+        with download_relevant_imgs(snaps_arr.take(stale)) as img_paths:
+            slots_counts = yolo_funcs.get_detector().count(img_paths)
+        set_counts(snaps_arr, stale, slots_counts)
+    ranked, avoided = rank_snaps(address, dest_loc, snaps_arr)
+    print("travel time lookups avoided by pruning: ", avoided)
+
+    return report_best(ranked[0][0] if ranked else None)
+
 
+async def manager_async(address: str, radius: float = 1):
+    """
+    Asynchronous variant of `manager` that overlaps the pipeline's blocking steps instead of running them one by one.
+
+    After the address is geocoded, the batched travel times lookup of all the candidate snapshots is sent while the
+    snapshot images are downloaded concurrently. The images that finished downloading are detected together in one
+    batched forward pass while the next ones download, and each snapshot is graded as soon as its detection and the
+    travel times are ready, so a request takes about as long as its slowest dependency rather than the sum of all of
+    them. The blocking calls, including the dataset lookups, run in the default executor.
+
+    :param: address: The address for which to find the best parking spot.
+    :type: address: str
+    :param: radius: The search radius around the address in kilometers.
+    :type: radius: float
+    :return: The address of the best parking spot, or None if no parking spot was found.
+    :rtype: str or None
+    """
+    lat, lng = await asyncio.to_thread(loc.get_lat_long, address)
+    snaps_arr = await asyncio.to_thread(create_arr, Location(lat, lng), radius)
+    travel_times = asyncio.create_task(
+        asyncio.to_thread(loc.get_travel_times, [snap.location for snap in snaps_arr], address))
+    # Only the dataset columns are used, the slots are read from the table once each snapshot is detected
+    _, avg_time_to_park, searching_by_hour = await asyncio.to_thread(scoring.candidate_columns, snaps_arr)
+    stale = use_occupancy(snaps_arr)
+    detector = yolo_funcs.get_detector()
+    fetcher = image_fetcher.get_fetcher()
+
+    def grade(indices: list, time_to_dest: list):
+        indices = np.array(indices, dtype=np.int64)
+        # Failed travel time lookups (None) are graded -inf, so top_k never picks them
+        snaps_arr.grades[indices] = scoring.grade_all(snaps_arr.available_slots[indices], avg_time_to_park[indices],
+                                                      searching_by_hour[indices],
+                                                      np.array(time_to_dest, dtype=float)[indices])
+        for i in indices.tolist():
+            print("snap: ", snaps_arr[i], ", grade: ", snaps_arr.grades[i])
+
+    img_names = [name + ".jpg" for name in snaps_arr.names]
+    fetcher.pin(img_names)  # concurrent requests must not evict this request's images
+    downloads = {asyncio.create_task(asyncio.to_thread(fetcher.fetch_one, snaps_arr.name(i) + ".jpg")): i
+                 for i in stale.tolist()}
+    ungraded = np.setdiff1d(np.arange(len(snaps_arr)), stale).tolist()  # counts taken from the occupancy table
+    pending = set(downloads) | {travel_times}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            detected = [task for task in done if task is not travel_times]
+            if detected:
+                indices = [downloads[task] for task in detected]
+                set_counts(snaps_arr, indices,
+                           await asyncio.to_thread(detector.count, [task.result() for task in detected]))
+                ungraded += indices
+            if travel_times.done():
+                time_to_dest = travel_times.result()  # raises if the lookup failed
+                if ungraded:
+                    grade(ungraded, time_to_dest)
+                    ungraded = []
+    finally:
+        for task in pending:
+            task.cancel()  # don't leave lookups and downloads pending if a download or detection failed
+        fetcher.release(img_names)
+    await asyncio.to_thread(fetcher.evict)
+
+    best = scoring.top_k(snaps_arr.grades, 1)
+    best_snap = snaps_arr[int(best[0])] if len(best) else None
+    return await asyncio.to_thread(report_best, best_snap)
+
+
+def use_occupancy(snaps_arr: SnapshotTable, max_age: float = occupancy.FRESHNESS) -> np.ndarray:
+    """
+    Sets the available and unavailable slots of the snapshots whose camera was detected recently enough from the
+    occupancy table.
+
+    :param: snaps_arr: The snapshots to update.
+    :type: snaps_arr: SnapshotTable
+    :param: max_age: The freshness threshold in seconds.
+    :type: max_age: float
+    :return: The indices of the snapshots that weren't updated from the table and need live detection.
+    :rtype: np.ndarray
+    """
+    table = occupancy.get_table()
+    stale = []
+    for i, name in enumerate(snaps_arr.names):
+        entry = table.get_fresh(name, max_age)
+        if entry is None:
+            stale.append(i)
+            continue
+        snaps_arr.available_slots[i] = entry.available
+        snaps_arr.unavailable_slots[i] = entry.unavailable
+    return np.array(stale, dtype=np.int64)
+
+
+def set_counts(snaps_arr: SnapshotTable, indices, slots_counts: list):
+    """
+    Sets the slots of snapshots from their live detection counts, and stores the counts in the occupancy table.
+
+    :param: snaps_arr: The snapshots to update.
+    :type: snaps_arr: SnapshotTable
+    :param: indices: The indices of the detected snapshots.
+    :type: indices: array-like
+    :param: slots_counts: The detection counts of the snapshots, as returned by ParkingDetector.count.
+    :type: slots_counts: list of dict
+    :return: None
+    :rtype: None
+    """
+    snaps_arr.set_counts(indices, slots_counts, yolo_funcs.AVAILABLE_CLASS, yolo_funcs.UNAVAILABLE_CLASS)
+    for i, counts in zip(np.asarray(indices).tolist(), slots_counts):
+        occupancy.get_table().update(snaps_arr.name(i), counts)
+
+
+def report_best(best_snap: Snapshot | None) -> str | None:
+    """
+    Translates the location of the best snapshot to an address and prints it to the console.
+
+    :param: best_snap: The snapshot with the highest grade, or None if no snapshot was graded above 0.
+    :type: best_snap: Snapshot or None
+    :return: The address of the best snapshot, or None if there is no best snapshot.
+    :rtype: str or None
+    """
     print("\n\nBest snap:", best_snap,  "\n\n")
+    if best_snap is None:
+        return None
+    best_address = loc.get_address(best_snap.location)
     print("--------------------------------------------------------------------------")
-    print("The best parking for you available in", loc.get_address(best_snap.location))
+    print("The best parking for you available in", best_address)
     print("--------------------------------------------------------------------------")
+    return best_address
 
 
-
-def gradeSnap(des_string: str, snap: Snapshot) -> float:
+def gradeSnap(des_string: str, snap: Snapshot, time_to_dest: float | None = None,
+              profile=scoring.DEFAULT_PROFILE) -> float:
     """
     Calculates the suitability score of a parking spot snapshot based on various factors.
 
@@ -61,59 +194,162 @@ def gradeSnap(des_string: str, snap: Snapshot) -> float:
     :type: des_string: str
     :param: snap: The parking spot snapshot to be evaluated.
     :type: snap: Snapshot
-    :return: The suitability score of the parking spot snapshot.
+    :param: time_to_dest: The travel time between the snapshot and the destination in minutes, if it was already
+            retrieved (e.g. by a batched get_travel_times call). It is looked up with the Directions API otherwise,
+            including when the batched lookup of this snapshot failed (None).
+    :type: time_to_dest: float or None
+    :param: profile: The weight profile of the grade, see scoring.PROFILES.
+    :type: profile: str or scoring.WeightProfile
+    :return: The suitability score of the parking spot snapshot, 0 if its travel time can't be retrieved.
     :rtype: float
     """
     if snap.available_slots == 0:
         return 0
-    time_to_dest = loc.get_travel_time(des_string, loc.get_address(snap.location))
+    if time_to_dest is None:
+        time_to_dest = loc.get_travel_time(des_string, loc.get_address(snap.location))
+    if time_to_dest is None or time_to_dest < 0:  # no route or failed request, an unknown time can't be graded
+        print("no travel time for snap: ", snap)
+        return 0
     avg_time_to_park, searching_by_hour = loc.values_from_ds(snap.location.latitude, snap.location.longitude)
-    parking_num = yolo_funcs.get_parking_num(snap.name)
+    parking_num = snap.available_slots
     print("searching_by_hour: ", searching_by_hour, ", avg time to park: ", avg_time_to_park, ", time to dest: ",
           time_to_dest)
-    if searching_by_hour is not None:
-        grade = parking_num * 0.6 + ((60 - avg_time_to_park) * 0.1) - (searching_by_hour * 0.1 * 60) + (
-                    (60 - time_to_dest) * 0.2)
+    searching_by_hour = np.nan if searching_by_hour is None else searching_by_hour
+    return float(scoring.grade_all(parking_num, avg_time_to_park, searching_by_hour, time_to_dest, profile)[0])
 
-    else:
-        grade = parking_num * 0.65 + ((60 - avg_time_to_park) * 0.1) + ((60 - time_to_dest) * 0.25)
-    return grade
 
+def grade_upper_bounds(slots, avg_time_to_park, searching_by_hour, distances,
+                       profile=scoring.DEFAULT_PROFILE) -> np.ndarray:
+    """
+    Calculates an upper bound of the grade of many snapshots without any external call, from their scoring columns and
+    a lower bound of their travel times: the straight-line distance at MAX_TRAVEL_SPEED_KMH. The grade decreases with
+    the travel time, so the grade at a lower bound of the travel time is an upper bound of the grade. The bounds only
+    hold for retrieved travel times; failed lookups must be dropped before grades are compared to them.
+
+    :param: slots: The available slots of the snapshots.
+    :param: avg_time_to_park: The 'AvgTimeToPark' values of the snapshots.
+    :param: searching_by_hour: The 'SearchingByHour' values of the snapshots, NaN where they are missing.
+    :param: distances: The straight-line distances between the snapshots and the destination in kilometers.
+    :type: distances: np.ndarray
+    :param: profile: The weight profile of the grades.
+    :type: profile: str or scoring.WeightProfile
+    :return: Grades that the snapshots can't exceed.
+    :rtype: np.ndarray
+    """
+    min_time_to_dest = np.asarray(distances, dtype=float) / MAX_TRAVEL_SPEED_KMH * 60
+    return scoring.grade_all(slots, avg_time_to_park, searching_by_hour, min_time_to_dest, profile)
+
+
+def rank_snaps(des_string: str, destination: Location, snaps_arr: list, k: int = 1,
+               profile=scoring.DEFAULT_PROFILE, batch_size: int = RANKING_BATCH_SIZE):
+    """
+    Finds the k snapshots with the highest grades, retrieving as few travel times as possible.
 
-def create_arr(destination: Location):
+    The snapshots with free slots are visited in decreasing order of their grade upper bounds. Their travel times are
+    retrieved batch_size at a time and their grades computed at once, and the search stops as soon as no remaining
+    snapshot can exceed the k-th best grade found so far, so the travel times of the remaining snapshots are never
+    requested. The result is the same as grading every snapshot, except between snapshots with equal grades.
+    Snapshots whose travel time can't be retrieved get a grade of -inf and are never returned.
+
+    :param: des_string: The destination address.
+    :type: des_string: str
+    :param: destination: The location of the destination.
+    :type: destination: Location
+    :param: snaps_arr: The snapshots to rank, with their available slots already set. The grades of the graded
+            snapshots are stored in the table.
+    :type: snaps_arr: SnapshotTable or list of Snapshot
+    :param: k: The number of snapshots to return.
+    :type: k: int
+    :param: profile: The weight profile of the grades.
+    :type: profile: str or scoring.WeightProfile
+    :param: batch_size: The number of travel times retrieved in one request.
+    :type: batch_size: int
+    :return: Up to k (snapshot, grade) pairs graded above 0, from the best to the worst, and the number of travel time
+             lookups that were avoided.
+    :rtype: tuple
+    """
+    if not isinstance(snaps_arr, SnapshotTable):
+        snaps_arr = SnapshotTable.from_snapshots(snaps_arr, parking_dataset.get_dataset())
+    open_idx = np.flatnonzero(snaps_arr.available_slots > 0)
+    if not len(open_idx):
+        return [], 0
+    open_snaps = snaps_arr.take(open_idx)
+    slots, avg_time_to_park, searching_by_hour = scoring.candidate_columns(open_snaps)
+    distances = loc.get_distances(destination.latitude, destination.longitude, open_snaps.latitudes,
+                                  open_snaps.longitudes)
+    bounds = grade_upper_bounds(slots, avg_time_to_park, searching_by_hour, distances, profile)
+    order = np.argsort(-bounds, kind='stable')
+
+    grades = open_snaps.grades  # NaN until the travel time of the snapshot is retrieved
+
+    def kth_best_grade() -> float:
+        graded = grades[~np.isnan(grades)]
+        return max(float(np.sort(graded)[-k]), 0) if len(graded) >= k else 0
+
+    visited = 0
+    while visited < len(order) and bounds[order[visited]] > kth_best_grade():
+        batch = order[visited:visited + batch_size]
+        batch = batch[bounds[batch] > kth_best_grade()]
+        travel_times = loc.get_travel_times([open_snaps.location(j) for j in batch], des_string)
+        travel_times = np.array(travel_times, dtype=float)  # NaN where the lookup failed
+        grades[batch] = scoring.grade_all(slots[batch], avg_time_to_park[batch], searching_by_hour[batch],
+                                          travel_times, profile)
+        # A failed lookup says nothing about the travel time, so the snapshot is dropped rather than graded against
+        # the bounds, which only hold for real travel times
+        grades[batch[np.isnan(travel_times) | (travel_times < 0)]] = -np.inf
+        for j in batch:
+            print("snap: ", open_snaps[j], ", grade upper bound: ", bounds[j], ", grade: ", grades[j])
+        visited += len(batch)
+
+    snaps_arr.grades[open_idx] = grades
+    best = scoring.top_k(np.nan_to_num(grades, nan=0), k)
+    return [(snaps_arr[int(open_idx[j])], float(grades[j])) for j in best], len(order) - visited
+
+
+def create_arr(destination: Location, radius: float = 1):
     """
-    Creates an array of parking spot snapshots within a 1km radius of the given destination location.
+    Creates an array of parking spot snapshots within a given radius of the destination location.
 
-    This function reads data from a CSV file ('Searching_for_parking.csv') and checks each row to see if the
-    parking spot's location (defined by the 'Latitude_SW' and 'Longitude_SW' columns) is within a 1km radius
-    of the given destination location. If it is, a new parking spot snapshot with the location and other details
-    is created and added to an array.
+    This function queries the camera spatial index (built over the 'Latitude_SW' and 'Longitude_SW' columns of
+    'Searching_for_parking.csv') for the parking spots within the radius of the given destination location, and
+    stores their dataset rows and coordinates in the columns of a snapshot table.
 
     :param: destination: The destination location for which the parking spot snapshots are being created.
     :type: destination: Location
-    :return: An array of parking spot snapshots within a 1km radius of the destination location.
-    :rtype: list of Snapshot
+    :param: radius: The search radius in kilometers.
+    :type: radius: float
+    :return: The parking spot snapshots within the radius of the destination location.
+    :rtype: SnapshotTable
     """
-    snap_arr = []
     print("_______________________________")
-    with open('Searching_for_parking.csv', 'r') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            latitude_sw = float(row['Latitude_SW'])
-            longitude_sw = float(row['Longitude_SW'])
-            current_loc = Location(latitude_sw, longitude_sw)
-            if loc.get_distance(destination, current_loc) < 1:  # means 1km
-                # print("distance between them: ", loc.get_distance(dest, current_loc))
-                # name_of_snap = str(current_loc.latitude) + ',' + str(current_loc.longitude) + ".jpg"
-                name_of_snap = str(current_loc.latitude) + ',' + str(current_loc.longitude)
-                new_snap = Snapshot(name=name_of_snap, location=current_loc, available_slots=0)
-                snap_arr.append(new_snap)
-                print("new snap in the arr: ", new_snap)
+    index = get_camera_index()
+    rows = index.query(destination.latitude, destination.longitude, radius)
+    snap_arr = SnapshotTable(rows, index.latitudes[rows], index.longitudes[rows])
+    print("snaps in the arr: ", len(snap_arr))
     print("_______________________________")
 
     return snap_arr
 
 
+def get_camera_index() -> GridIndex:
+    """
+    Returns the spatial index over the camera locations of the parking dataset.
+
+    The index is built on first use and rebuilt only when the dataset is reloaded from disk, so calling this at startup
+    moves the build cost out of the first request.
+
+    :return: The spatial index over the dataset's 'Latitude_SW' and 'Longitude_SW' columns.
+    :rtype: GridIndex
+    """
+    global _camera_index
+    dataset = parking_dataset.get_dataset()
+    index = _camera_index
+    if index is None or index.latitudes is not dataset.latitudes:
+        index = GridIndex(dataset.latitudes, dataset.longitudes)
+        _camera_index = index
+    return index
+
+
 def clean_folder():
     """
     Deletes all files within a specified folder.
@@ -140,17 +376,21 @@ def download_relevant_imgs(snap_arr):
     """
     Downloads relevant images from a list of Snapshots.
 
-    This function takes a list of Snapshots as input and downloads relevant images for each Snapshot. It first
-    calls the `clean_folder` function to delete all files in a specified folder. Then, for each Snapshot in the
-    input list, it calls the `download_image` function to download the image associated with the Snapshot's name.
+    This function takes a list of Snapshots as input and fetches the image of each Snapshot concurrently through the
+    shared image fetcher, which keeps the images in a local cache and only downloads the ones that changed in the
+    bucket since they were last fetched. The images stay pinned in the cache, so concurrent requests can't evict
+    them, until the returned context manager exits.
 
-    :param: snap_arr: List of Snapshots to download images for.
-    :type: snap_arr: list[Snapshot]
-    :return: None
+    Usage:
+        with download_relevant_imgs(snap_arr) as img_paths:
+            ...
+
+    :param: snap_arr: The Snapshots to download images for.
+    :type: snap_arr: SnapshotTable or list[Snapshot]
+    :return: A context manager yielding the local paths of the images, in the same order as the Snapshots.
     """
-    clean_folder()
-    for snap in snap_arr:
-        download_image(snap.name)
+    names = snap_arr.names if isinstance(snap_arr, SnapshotTable) else [snap.name for snap in snap_arr]
+    return image_fetcher.get_fetcher().checkout([name + ".jpg" for name in names])
 
 
 def download_image(image_name):
@@ -164,7 +404,6 @@ def download_image(image_name):
     :type: image_name: str
     :return: None
     """
-    # src_folder = 'parking'
     dst_folder = 'relevant_parking_slots'
     image_name = image_name + ".jpg"
 
@@ -174,9 +413,8 @@ def download_image(image_name):
     bucket = storage.bucket()
     print("searching the name ", image_name, " in the server")
     blob = bucket.get_blob(image_name)
-    local_folder_path = 'relevant_parking_slots'  # Replace with the path to your local folder
 
-    blob.download_to_filename(os.path.join(local_folder_path, image_name))
+    blob.download_to_filename(os.path.join(dst_folder, image_name))
 
 
 
@@ -0,0 +1,127 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import locations as loc
+
+
+class MapsStubServer:
+    """
+    Represents a local HTTP server that imitates the Google Maps Geocoding, Directions and Distance Matrix endpoints
+    used by locations.py, so the Maps calls can be tested offline and counted.
+
+    Addresses are resolved through the 'places' dict (address -> (lat, lng)), "lat,lng" strings are used as is, and
+    travel times are the haversine distance driven at a constant speed. Failures can be simulated: the Distance
+    Matrix elements of the origins in 'unreachable' get a ZERO_RESULTS status, and setting 'matrix_status' (e.g. to
+    "OVER_QUERY_LIMIT") makes every Distance Matrix request fail as a whole.
+
+    Usage:
+        with MapsStubServer(places={"Centre St": (51.045, -114.063)}) as stub:
+            loc.get_travel_times(origins, "Centre St")
+            print(stub.requests["distancematrix"])
+    """
+    def __init__(self, places: dict | None = None, speed_kmh: float = 30, default_location=(51.045, -114.063),
+                 unreachable=(), matrix_status: str = "OK", host: str = '127.0.0.1', port: int = 0):
+        self.places = places or {}
+        self.speed_kmh = speed_kmh
+        self.default_location = default_location
+        self.unreachable = set(unreachable)  # (lat, lng) origins without a route
+        self.matrix_status = matrix_status  # top-level status of every Distance Matrix response
+        self.requests = Counter()  # number of requests per endpoint
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+        self._previous_url = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        self._previous_url = loc.MAPS_API_URL
+        loc.MAPS_API_URL = self.url
+        return self
+
+    def __exit__(self, *exc):
+        loc.MAPS_API_URL = self._previous_url
+        self.stop()
+
+    def resolve(self, place: str) -> tuple:
+        """
+        Returns the coordinates of an address or a "lat,lng" string.
+
+        :param: place: The address or the coordinates.
+        :type: place: str
+        :return: The latitude and longitude.
+        :rtype: tuple
+        """
+        if place in self.places:
+            return self.places[place]
+        try:
+            lat, lng = (float(x) for x in place.split(","))
+            return lat, lng
+        except ValueError:
+            return self.default_location
+
+    def travel_seconds(self, origin: str, destination: str) -> int:
+        (lat1, lng1), (lat2, lng2) = self.resolve(origin), self.resolve(destination)
+        km = loc.get_distance(loc.Location(lat1, lng1), loc.Location(lat2, lng2))
+        return round(km / self.speed_kmh * 3600)
+
+    def _geocode(self, query: dict) -> dict:
+        if "latlng" in query:
+            return {"status": "OK", "results": [{"formatted_address": query["latlng"]}]}  # resolvable by the stub
+        lat, lng = self.resolve(query["address"])
+        return {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]}
+
+    def _directions(self, query: dict) -> dict:
+        seconds = self.travel_seconds(query["origin"], query["destination"])
+        return {"status": "OK", "routes": [{"legs": [{"duration": {"value": seconds}}]}]}
+
+    def _distance_matrix(self, query: dict) -> dict:
+        if self.matrix_status != "OK":
+            return {"status": self.matrix_status, "rows": []}
+        origins = query["origins"].split("|")
+        destinations = query["destinations"].split("|")
+        rows = [{"elements": [{"status": "ZERO_RESULTS"} if self.resolve(o) in self.unreachable else
+                              {"status": "OK", "duration": {"value": self.travel_seconds(o, d)}}
+                              for d in destinations]} for o in origins]
+        return {"status": "OK", "rows": rows}
+
+    def _handler_class(self):
+        stub = self
+        endpoints = {"geocode": self._geocode, "directions": self._directions, "distancematrix": self._distance_matrix}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.strip("/").split("/")[0]
+                if endpoint not in endpoints:
+                    self.send_error(404)
+                    return
+                stub.requests[endpoint] += 1
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = json.dumps(endpoints[endpoint](query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # keep the test output quiet
+
+        return Handler
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import namedtuple
+
+import image_fetcher
+import parking_dataset
+import yolo_funcs
+from snapshot import SnapshotTable
+
+REFRESH_PERIOD = 120  # seconds between two refreshes of the whole table
+FRESHNESS = 300  # seconds an entry is used before falling back to live detection
+BATCH_SIZE = 32
+
+Occupancy = namedtuple('Occupancy', ['available', 'unavailable', 'timestamp'])
+
+
+class OccupancyTable:
+    """
+    Represents the latest known number of available and unavailable parking slots of every camera, keyed by the
+    snapshot name ("<lat>,<lng>"), with the time each entry was detected.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, name: str, counts: dict, timestamp: float | None = None):
+        """
+        Stores the detection counts of a camera.
+
+        :param: name: The snapshot name of the camera.
+        :type: name: str
+        :param: counts: The number of detections of each class index, as returned by ParkingDetector.count.
+        :type: counts: dict
+        :param: timestamp: The time of the detection, now by default.
+        :type: timestamp: float or None
+        :return: None
+        :rtype: None
+        """
+        entry = Occupancy(counts.get(yolo_funcs.AVAILABLE_CLASS, 0), counts.get(yolo_funcs.UNAVAILABLE_CLASS, 0),
+                          time.time() if timestamp is None else timestamp)
+        with self._lock:
+            self._entries[name] = entry
+
+    def get(self, name: str) -> Occupancy | None:
+        with self._lock:
+            return self._entries.get(name)
+
+    def get_fresh(self, name: str, max_age: float = FRESHNESS) -> Occupancy | None:
+        """
+        Returns the entry of a camera if it was detected less than max_age seconds ago.
+
+        :param: name: The snapshot name of the camera.
+        :type: name: str
+        :param: max_age: The freshness threshold in seconds.
+        :type: max_age: float
+        :return: The entry, or None if it is missing or too old.
+        :rtype: Occupancy or None
+        """
+        entry = self.get(name)
+        if entry is None or time.time() - entry.timestamp > max_age:
+            return None
+        return entry
+
+
+class OccupancyDaemon(threading.Thread):
+    """
+    Represents a background thread that periodically fetches the image of every camera of the parking dataset, runs
+    batched detection on them (batch_size images stacked into one forward pass), and stores the counts in the
+    occupancy table.
+    """
+    def __init__(self, table: OccupancyTable | None = None, period: float = REFRESH_PERIOD,
+                 batch_size: int = BATCH_SIZE):
+        super().__init__(name='occupancy-daemon', daemon=True)
+        self.table = get_table() if table is None else table
+        self.period = period
+        self.batch_size = batch_size
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def refresh(self):
+        """
+        Detects every camera of the dataset once and updates the table.
+
+        :return: None
+        :rtype: None
+        """
+        dataset = parking_dataset.get_dataset()
+        names = SnapshotTable.from_dataset(dataset).names
+        for start in range(0, len(names), self.batch_size):
+            if self._stop_event.is_set():
+                return
+            batch = names[start:start + self.batch_size]
+            try:
+                self._detect(batch)
+            except Exception:
+                # Retry the cameras one by one, so a single missing image doesn't drop the whole batch
+                for name in batch:
+                    try:
+                        self._detect([name])
+                    except Exception as e:
+                        print(f"Failed to refresh camera {name}. Error: {e}")
+
+    def _detect(self, names: list):
+        with image_fetcher.get_fetcher().checkout([name + ".jpg" for name in names]) as img_paths:
+            slots_counts = yolo_funcs.get_detector().count(img_paths, batch_size=len(img_paths))  # one forward pass
+        timestamp = time.time()
+        for name, counts in zip(names, slots_counts):
+            self.table.update(name, counts, timestamp)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.time()
+            self.refresh()
+            self._stop_event.wait(max(self.period - (time.time() - start), 0))
+
+
+_table = OccupancyTable()
+
+
+def get_table() -> OccupancyTable:
+    """
+    Returns the process-wide occupancy table, shared by the daemon and the requests.
+
+    :return: The occupancy table.
+    :rtype: OccupancyTable
+    """
+    return _table
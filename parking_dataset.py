@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DATASET_PATH = 'Searching_for_parking.csv'
+HOURS_IN_DAY = 24
+RELOAD_CHECK_INTERVAL = 5  # seconds between two checks of the CSV file's mtime
+
+
+class ParkingDataset:
+    """
+    Represents the parking dataset CSV loaded into memory, with rows keyed by their (Latitude_SW, Longitude_SW)
+    coordinates and the 'SearchingByHour' column parsed into a dense (rows x 24) array.
+
+    A loaded dataset is never modified: a change of the CSV file is picked up by get_dataset, which loads a new
+    dataset and swaps it in, so a reader that fetches the dataset once per call always sees a consistent snapshot.
+    """
+    def __init__(self, csv_path: str = DATASET_PATH):
+        self.csv_path = csv_path
+        self.mtime = os.stat(csv_path).st_mtime_ns
+        df = pd.read_csv(csv_path)
+
+        self.latitudes = df['Latitude_SW'].to_numpy(dtype=float)
+        self.longitudes = df['Longitude_SW'].to_numpy(dtype=float)
+        self.avg_time_to_park = df['AvgTimeToPark'].to_numpy(dtype=float)
+        # Hours that are missing from a row's 'SearchingByHour' JSON are stored as NaN
+        self.searching_by_hour = np.full((len(df), HOURS_IN_DAY), np.nan)
+        for i, raw in enumerate(df['SearchingByHour']):
+            if not isinstance(raw, str):
+                continue
+            for hour, value in json.loads(raw).items():
+                if value is not None:
+                    self.searching_by_hour[i, int(hour)] = value
+        for array in self.latitudes, self.longitudes, self.avg_time_to_park, self.searching_by_hour:
+            array.flags.writeable = False
+
+        self._rows = {}
+        for i, key in enumerate(zip(self.latitudes.tolist(), self.longitudes.tolist())):
+            self._rows.setdefault(key, i)  # keep the first row, like the original boolean-index lookup
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def row_of(self, latitude: float, longitude: float) -> int | None:
+        """
+        Returns the row number of the given coordinates in the dataset, or None if they are not in it.
+
+        :param: latitude: The 'Latitude_SW' value of the row.
+        :type: latitude: float
+        :param: longitude: The 'Longitude_SW' value of the row.
+        :type: longitude: float
+        :return: The row number, or None if not found.
+        :rtype: int or None
+        """
+        return self._rows.get((float(latitude), float(longitude)))
+
+    def searching_at(self, row_num: int, hour: int) -> float | None:
+        """
+        Returns the 'SearchingByHour' value of a row for the given hour, or None if the hour is not in the dataset.
+
+        :param: row_num: The row number in the dataset.
+        :type: row_num: int
+        :param: hour: The hour of the day (0-23).
+        :type: hour: int
+        :return: The 'SearchingByHour' value, or None if missing.
+        :rtype: float or None
+        """
+        value = self.searching_by_hour[row_num, hour]
+        return None if np.isnan(value) else float(value)
+
+
+_dataset = None
+_checked_at = 0.0  # time.monotonic() of the last check of the CSV file's mtime
+_dataset_lock = threading.Lock()
+
+
+def get_dataset(csv_path: str = DATASET_PATH) -> ParkingDataset:
+    """
+    Returns the process-wide parking dataset, loading it on first use and reloading it if the file changed on disk.
+
+    The file's mtime is checked at most once every RELOAD_CHECK_INTERVAL seconds. A reload builds a new dataset and
+    swaps it in, so callers should fetch the dataset once and use it for the whole lookup.
+
+    :param: csv_path: The path of the dataset CSV file.
+    :type: csv_path: str
+    :return: The loaded parking dataset.
+    :rtype: ParkingDataset
+    """
+    global _dataset, _checked_at
+    now = time.monotonic()
+    with _dataset_lock:
+        if _dataset is None or _dataset.csv_path != csv_path:
+            _dataset, _checked_at = ParkingDataset(csv_path), now
+            return _dataset
+        dataset = _dataset
+        if now - _checked_at < RELOAD_CHECK_INTERVAL:
+            return dataset
+        _checked_at = now  # other callers keep using the current dataset while this one checks the file
+
+    try:
+        changed = os.stat(csv_path).st_mtime_ns != dataset.mtime
+    except OSError:
+        changed = False
+    if changed:
+        dataset = ParkingDataset(csv_path)
+        with _dataset_lock:
+            _dataset = dataset
+    return dataset
@@ -0,0 +1,114 @@
+import datetime
+from collections import namedtuple
+
+import numpy as np
+
+import parking_dataset
+from snapshot import SnapshotTable
+
+# Weights of the terms of a grade: grade = slots * available slots + time_to_park * (60 - avg time to park)
+#                                          - searching * searching by hour + time_to_dest * (60 - travel time)
+Weights = namedtuple('Weights', ['slots', 'time_to_park', 'searching', 'time_to_dest'])
+# The weights used when the dataset has the searching value of the current hour, and the weights used when it doesn't
+WeightProfile = namedtuple('WeightProfile', ['with_searching', 'without_searching'])
+
+PROFILES = {
+    'default': WeightProfile(Weights(0.6, 0.1, 0.1 * 60, 0.2), Weights(0.65, 0.1, 0, 0.25)),
+}
+DEFAULT_PROFILE = 'default'
+
+
+def get_profile(profile) -> WeightProfile:
+    """
+    Returns a weight profile by name, or the profile itself if it is already a WeightProfile.
+
+    :param: profile: The name of a profile in PROFILES, or a WeightProfile.
+    :type: profile: str or WeightProfile
+    :return: The weight profile.
+    :rtype: WeightProfile
+    """
+    return PROFILES[profile] if isinstance(profile, str) else profile
+
+
+def candidate_columns(snaps_arr: list, hour: int | None = None) -> tuple:
+    """
+    Gathers the scoring columns of many snapshots from the in-memory parking dataset.
+
+    :param: snaps_arr: The snapshots, with their available slots already set.
+    :type: snaps_arr: SnapshotTable or list of Snapshot
+    :param: hour: The hour of the day of the 'SearchingByHour' values, the current hour by default.
+    :type: hour: int or None
+    :return: The available slots, the 'AvgTimeToPark' values, and the 'SearchingByHour' values (NaN where the hour is
+             missing) of the snapshots, as arrays in the same order as the snapshots.
+    :rtype: tuple of np.ndarray
+    """
+    if hour is None:
+        hour = datetime.datetime.now().hour
+    dataset = parking_dataset.get_dataset()
+    if isinstance(snaps_arr, SnapshotTable):
+        rows = snaps_arr.rows
+        return (snaps_arr.available_slots.astype(float), dataset.avg_time_to_park[rows],
+                dataset.searching_by_hour[rows, hour])
+    rows = []
+    for snap in snaps_arr:
+        row_num = dataset.row_of(snap.location.latitude, snap.location.longitude)
+        if row_num is None:
+            raise KeyError(f"No dataset row for ({snap.location.latitude}, {snap.location.longitude})")
+        rows.append(row_num)
+    rows = np.array(rows, dtype=int)
+    slots = np.array([snap.available_slots for snap in snaps_arr], dtype=float)
+    return slots, dataset.avg_time_to_park[rows], dataset.searching_by_hour[rows, hour]
+
+
+def grade_all(slots, avg_time_to_park, searching_by_hour, time_to_dest, profile=DEFAULT_PROFILE) -> np.ndarray:
+    """
+    Calculates the grades of many parking spots at once.
+
+    With the default profile, the grade of every spot is the one gradeSnap gives it. Spots without available slots get
+    a grade of 0, and spots whose travel time is missing (NaN, e.g. a failed get_travel_times lookup) or negative (the
+    -1 of a failed get_travel_time) get a grade of -inf, so top_k never returns them.
+
+    :param: slots: The number of available slots of each spot.
+    :type: slots: array-like
+    :param: avg_time_to_park: The 'AvgTimeToPark' value of each spot.
+    :type: avg_time_to_park: array-like
+    :param: searching_by_hour: The 'SearchingByHour' value of each spot for the current hour, NaN where it is missing.
+    :type: searching_by_hour: array-like
+    :param: time_to_dest: The travel time between each spot and the destination in minutes, None or NaN where it is
+            missing.
+    :type: time_to_dest: array-like
+    :param: profile: The name of a profile in PROFILES, or a WeightProfile.
+    :type: profile: str or WeightProfile
+    :return: The grade of each spot.
+    :rtype: np.ndarray
+    """
+    profile = get_profile(profile)
+    slots = np.atleast_1d(np.asarray(slots, dtype=float))
+    avg_time_to_park = np.atleast_1d(np.asarray(avg_time_to_park, dtype=float))
+    searching_by_hour = np.atleast_1d(np.asarray(searching_by_hour, dtype=float))
+    time_to_dest = np.atleast_1d(np.asarray(time_to_dest, dtype=float))
+
+    has_searching = ~np.isnan(searching_by_hour)
+    w = np.where(has_searching[:, None], np.array(profile.with_searching, dtype=float),
+                 np.array(profile.without_searching, dtype=float))
+    grades = (slots * w[:, 0] + (60 - avg_time_to_park) * w[:, 1]
+              - np.where(has_searching, searching_by_hour, 0) * w[:, 2] + (60 - time_to_dest) * w[:, 3])
+    grades = np.where(np.isnan(time_to_dest) | (time_to_dest < 0), -np.inf, grades)  # unknown travel time
+    return np.where(slots > 0, grades, 0)
+
+
+def top_k(grades, k: int = 1) -> np.ndarray:
+    """
+    Returns the indices of the k highest grades above 0, from the highest to the lowest. Between equal grades, the
+    lower index comes first.
+
+    :param: grades: The grades, as returned by grade_all.
+    :type: grades: array-like
+    :param: k: The maximum number of indices to return.
+    :type: k: int
+    :return: The indices of the best grades.
+    :rtype: np.ndarray
+    """
+    grades = np.asarray(grades, dtype=float)
+    order = np.argsort(-grades, kind='stable')[:k]
+    return order[grades[order] > 0]
@@ -1,3 +1,5 @@
+import numpy as np
+
 from locations import Location
 
 
@@ -5,10 +7,176 @@ class Snapshot:
     """
     Represents a parking location with a name, latitude and longitude coordinates, and number of available parking slots
     """
+    __slots__ = ('name', 'location', 'available_slots')
+
     def __init__(self, name, location, available_slots):
         self.name = name
         self.location = location
         self.available_slots = available_slots
 
     def __str__(self):
-        return f"Name: {self.name}, Location: {self.location} - {self.available_slots} available slots"
\ No newline at end of file
+        return f"Name: {self.name}, Location: {self.location} - {self.available_slots} available slots"
+
+
+class SnapshotView(Snapshot):
+    """
+    Represents one row of a SnapshotTable that looks like a Snapshot. Reading or setting its attributes reads or sets
+    the columns of the table, so a view costs two references instead of a Snapshot, a Location and a name string.
+    """
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index: int):
+        self.table = table
+        self.index = index
+
+    @property
+    def name(self) -> str:
+        return self.table.name(self.index)
+
+    @property
+    def location(self) -> Location:
+        return self.table.location(self.index)
+
+    @property
+    def available_slots(self) -> int:
+        return int(self.table.available_slots[self.index])
+
+    @available_slots.setter
+    def available_slots(self, value: int):
+        self.table.available_slots[self.index] = value
+
+    @property
+    def unavailable_slots(self) -> int:
+        return int(self.table.unavailable_slots[self.index])
+
+    @unavailable_slots.setter
+    def unavailable_slots(self, value: int):
+        self.table.unavailable_slots[self.index] = value
+
+    @property
+    def grade(self) -> float:
+        return float(self.table.grades[self.index])
+
+
+class SnapshotTable:
+    """
+    Represents many parking location snapshots as contiguous columns: the dataset row of each camera (which identifies
+    its name), its coordinates, its available and unavailable slots, and its grade (NaN until it is graded).
+
+    Iterating over the table or indexing it with an int gives SnapshotView objects, so code written for a list of
+    Snapshot keeps working, while the radius filter, detection and scoring stages read and write the columns directly.
+    """
+    __slots__ = ('rows', 'latitudes', 'longitudes', 'available_slots', 'unavailable_slots', 'grades', '_names')
+
+    def __init__(self, rows, latitudes, longitudes):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.available_slots = np.zeros(len(self.rows), dtype=np.int32)
+        self.unavailable_slots = np.zeros(len(self.rows), dtype=np.int32)
+        self.grades = np.full(len(self.rows), np.nan)
+        self._names = None
+
+    @classmethod
+    def from_dataset(cls, dataset, rows=None):
+        """
+        Creates a table of the cameras of the parking dataset.
+
+        :param: dataset: The parking dataset.
+        :type: dataset: parking_dataset.ParkingDataset
+        :param: rows: The dataset rows of the cameras, all of them by default.
+        :type: rows: array-like or None
+        :return: The table.
+        :rtype: SnapshotTable
+        """
+        rows = np.arange(len(dataset)) if rows is None else np.asarray(rows, dtype=np.int64)
+        return cls(rows, dataset.latitudes[rows], dataset.longitudes[rows])
+
+    @classmethod
+    def from_snapshots(cls, snaps_arr, dataset):
+        """
+        Creates a table from a list of Snapshot objects, keeping their available slots.
+
+        :param: snaps_arr: The snapshots, whose locations must be cameras of the dataset.
+        :type: snaps_arr: list of Snapshot
+        :param: dataset: The parking dataset.
+        :type: dataset: parking_dataset.ParkingDataset
+        :return: The table.
+        :rtype: SnapshotTable
+        """
+        rows = []
+        for snap in snaps_arr:
+            row_num = dataset.row_of(snap.location.latitude, snap.location.longitude)
+            if row_num is None:
+                raise KeyError(f"No dataset row for ({snap.location.latitude}, {snap.location.longitude})")
+            rows.append(row_num)
+        table = cls.from_dataset(dataset, rows)
+        table.available_slots[:] = [snap.available_slots for snap in snaps_arr]
+        return table
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> SnapshotView:
+        if not -len(self) <= index < len(self):
+            raise IndexError("snapshot index out of range")
+        return SnapshotView(self, index % len(self))
+
+    def __iter__(self):
+        return (SnapshotView(self, i) for i in range(len(self)))
+
+    @property
+    def names(self) -> list:
+        """
+        The snapshot names ("<lat>,<lng>", the name of the camera image in the bucket), built on first use.
+
+        :rtype: list of str
+        """
+        if self._names is None:
+            self._names = [str(lat) + ',' + str(lng) for lat, lng in zip(self.latitudes.tolist(),
+                                                                          self.longitudes.tolist())]
+        return self._names
+
+    def name(self, index: int) -> str:
+        if self._names is not None:
+            return self._names[index]
+        return str(float(self.latitudes[index])) + ',' + str(float(self.longitudes[index]))
+
+    def location(self, index: int) -> Location:
+        return Location(float(self.latitudes[index]), float(self.longitudes[index]))
+
+    def take(self, indices) -> 'SnapshotTable':
+        """
+        Returns a new table with the given rows of this table, in the given order.
+
+        :param: indices: The indices of the rows, or a boolean mask.
+        :type: indices: array-like
+        :return: The new table, whose columns are copies.
+        :rtype: SnapshotTable
+        """
+        indices = np.asarray(indices)
+        table = SnapshotTable(self.rows[indices], self.latitudes[indices], self.longitudes[indices])
+        table.available_slots[:] = self.available_slots[indices]
+        table.unavailable_slots[:] = self.unavailable_slots[indices]
+        table.grades[:] = self.grades[indices]
+        return table
+
+    def set_counts(self, indices, slots_counts: list, available_class: int = 0, unavailable_class: int = 1):
+        """
+        Sets the available and unavailable slots of rows from detection counts.
+
+        :param: indices: The indices of the rows.
+        :type: indices: array-like
+        :param: slots_counts: The number of detections of each class index of every row, as returned by
+                ParkingDetector.count.
+        :type: slots_counts: list of dict
+        :param: available_class: The class index of available slots.
+        :type: available_class: int
+        :param: unavailable_class: The class index of unavailable slots.
+        :type: unavailable_class: int
+        :return: None
+        :rtype: None
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        self.available_slots[indices] = [counts.get(available_class, 0) for counts in slots_counts]
+        self.unavailable_slots[indices] = [counts.get(unavailable_class, 0) for counts in slots_counts]
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, get_distances
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class GridIndex:
+    """
+    Represents a spatial index over camera locations that buckets the points into a regular latitude/longitude grid,
+    so a radius query only scans the cells that overlap the query's bounding box. Longitudes are expected in
+    [-180, 180], and a query near the antimeridian also scans the cells on the other side of it.
+    """
+    def __init__(self, latitudes, longitudes, cell_size: float = 0.01):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.cell_size = cell_size  # in degrees, 0.01 is about 1.1km of latitude
+
+        rows = np.floor(self.latitudes / cell_size).astype(np.int64)
+        cols = np.floor(self.longitudes / cell_size).astype(np.int64)
+        self._row_min = int(rows.min()) if len(rows) else 0
+        self._col_min = int(cols.min()) if len(cols) else 0
+        self._n_rows = int(rows.max()) - self._row_min + 1 if len(rows) else 0
+        self._n_cols = int(cols.max()) - self._col_min + 1 if len(cols) else 0
+
+        keys = (rows - self._row_min) * self._n_cols + (cols - self._col_min)
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def query(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        """
+        Finds all the indexed points within a radius of the given location.
+
+        :param: latitude: The latitude of the query location in decimal degrees.
+        :type: latitude: float
+        :param: longitude: The longitude of the query location in decimal degrees.
+        :type: longitude: float
+        :param: radius: The search radius in kilometers.
+        :type: radius: float
+        :return: The indices of the matching points in ascending order.
+        :rtype: np.ndarray
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+
+        dlat = radius / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(latitude) + dlat, 90)))
+        dlng = 180 if cos_lat < 1e-9 else min(dlat / cos_lat, 180)
+
+        row_lo = max(math.floor((latitude - dlat) / self.cell_size) - self._row_min, 0)
+        row_hi = min(math.floor((latitude + dlat) / self.cell_size) - self._row_min, self._n_rows - 1)
+        if row_lo > row_hi:
+            return np.empty(0, dtype=np.int64)
+
+        # A longitude range that crosses the antimeridian continues on the other side of the grid
+        longitude = (longitude + 180) % 360 - 180
+        spans = [(longitude - dlng, longitude + dlng)]
+        if longitude - dlng < -180:
+            spans.append((longitude - dlng + 360, 180))
+        if longitude + dlng > 180:
+            spans.append((-180, longitude + dlng - 360))
+
+        # Every grid row is a contiguous run of the sorted keys, so each one is a single slice per span
+        row_starts = np.arange(row_lo, row_hi + 1, dtype=np.int64) * self._n_cols
+        candidates = []
+        for lng_lo, lng_hi in spans:
+            col_lo = max(math.floor(lng_lo / self.cell_size) - self._col_min, 0)
+            col_hi = min(math.floor(lng_hi / self.cell_size) - self._col_min, self._n_cols - 1)
+            if col_lo > col_hi:
+                continue
+            lo = np.searchsorted(self._keys, row_starts + col_lo, side='left')
+            hi = np.searchsorted(self._keys, row_starts + col_hi, side='right')
+            candidates += [self._order[a:b] for a, b in zip(lo, hi)]
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate(candidates))  # the spans overlap when dlng is 180
+
+        distances = get_distances(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        return candidates[distances < radius]
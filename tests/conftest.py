@@ -0,0 +1,12 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+try:
+    import APIs  # noqa: F401, the API keys aren't committed
+except ImportError:
+    sys.modules["APIs"] = types.SimpleNamespace(MapsKey="test-key", Telegram_Bot_API_TOKEN="test-token")
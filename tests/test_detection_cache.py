@@ -0,0 +1,27 @@
+from detection_cache import DetectionCache, detection_key
+
+
+def test_key_covers_every_detection_input():
+    base = ("img", "weights", (640, 640), 0.25, 0.45, 1000, "detector")
+    keys = {detection_key(*base)}
+    for i, other in enumerate(["img2", "weights2", (320, 320), 0.5, 0.6, 300, "detect.py"]):
+        keys.add(detection_key(*base[:i], other, *base[i + 1:]))
+    assert len(keys) == 8
+
+
+def test_get_returns_a_copy(tmp_path):
+    for cache in (DetectionCache(), DetectionCache(path=str(tmp_path / "cache.db"))):
+        cache.set("key", {0: 2, 1: 3}, [[0, 0, 1, 1, 0.9, 0]])
+        value = cache.get("key")
+        value["counts"][0] = 100
+        value["detections"].clear()
+        assert cache.get("key") == {"counts": {0: 2, 1: 3}, "detections": [[0, 0, 1, 1, 0.9, 0]]}
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    DetectionCache(path=path).set("key", {0: 2})
+    cache = DetectionCache(path=path)
+    assert cache.get("key")["counts"] == {0: 2}
+    assert cache.get("other") is None
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,103 @@
+import threading
+import types
+
+import pytest
+
+import dispatcher as dispatcher_module
+import locations as loc
+from dispatcher import RequestDispatcher
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dispatcher_module, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def make_dispatcher(workers=1, window=30):
+    release, started, runs, replies = threading.Event(), threading.Event(), [], []
+
+    def handler(address):
+        runs.append(address)
+        started.set()
+        assert release.wait(5)
+        return address
+
+    dispatcher = RequestDispatcher(handler, lambda chat_id, result, error: replies.append((chat_id, result, error)),
+                                   workers=workers, coalesce_window=window)
+    return dispatcher, release, started, runs, replies
+
+
+def test_window_starts_when_the_run_starts(monkeypatch, clock):
+    monkeypatch.setattr(loc, "get_lat_long", lambda address: None)
+    dispatcher, release, started, runs, replies = make_dispatcher(window=30)
+    dispatcher.submit(1, "Main St")
+    assert started.wait(5)
+    clock.now = 30
+    dispatcher.submit(2, "main st")  # joins the running job
+    clock.now = 31
+    dispatcher.submit(3, "Main St")  # the window closed, runs again
+    release.set()
+    dispatcher.join()
+    assert runs == ["Main St", "Main St"]
+    assert sorted(chat_id for chat_id, _, _ in replies) == [1, 2, 3]
+    assert dispatcher.coalesced == 1
+
+
+def test_queued_job_stays_joinable(monkeypatch, clock):
+    monkeypatch.setattr(loc, "get_lat_long", lambda address: None)
+    dispatcher, release, started, runs, replies = make_dispatcher(window=30)
+    dispatcher.submit(1, "First St")
+    assert started.wait(5)
+    dispatcher.submit(2, "Second St")  # queued behind the first run
+    clock.now = 100
+    dispatcher.submit(3, "Second St")  # older than the window, but the job hasn't started yet
+    release.set()
+    dispatcher.join()
+    assert runs == ["First St", "Second St"]
+    assert sorted(chat_id for chat_id, _, _ in replies) == [1, 2, 3]
+
+
+def test_nearby_destination_joins_running_job(monkeypatch, clock):
+    monkeypatch.setattr(loc, "get_lat_long", lambda address: (51.045, -114.063))
+    dispatcher, release, started, runs, replies = make_dispatcher(workers=2)
+    merge_nearby, merged = dispatcher._merge_nearby, threading.Event()
+
+    def merge_and_signal(job):
+        result = merge_nearby(job)
+        if job.address == "1st St":
+            merged.set()
+        return result
+
+    monkeypatch.setattr(dispatcher, "_merge_nearby", merge_and_signal)
+    dispatcher.submit(1, "Centre St")
+    assert started.wait(5)  # the running job was geocoded before its handler started
+    dispatcher.submit(2, "1st St")
+    assert merged.wait(5)
+    release.set()
+    dispatcher.join()
+    assert runs == ["Centre St"]
+    assert sorted(replies) == [(1, "Centre St", None), (2, "Centre St", None)]
+    assert dispatcher.coalesced == 1
+
+
+def test_geocoding_failure_runs_the_job_unmerged(monkeypatch, clock):
+    def get_lat_long(address):
+        raise ConnectionError("geocoding is down")
+
+    monkeypatch.setattr(loc, "get_lat_long", get_lat_long)
+    dispatcher, release, started, runs, replies = make_dispatcher()
+    release.set()
+    dispatcher.submit(1, "Main St")
+    dispatcher.join()
+    assert runs == ["Main St"]
+    assert replies == [(1, "Main St", None)]
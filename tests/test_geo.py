@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from geo import get_distances
+from locations import Location, get_distance
+
+
+def test_vectorized_matches_scalar_haversine():
+    lats, lngs = np.array([51.04, 51.05, 49.28]), np.array([-114.07, -114.06, -123.12])
+    expected = [get_distance(Location(51.045, -114.063), Location(lat, lng)) for lat, lng in zip(lats, lngs)]
+    assert np.allclose(get_distances(51.045, -114.063, lats, lngs), expected)
+    assert get_distances(lats, lngs, lats, lngs, matrix=True).shape == (3, 3)
+
+
+def test_spatial_index_does_not_import_locations():
+    # locations pulls in the API keys and the Maps HTTP session, the spatial index only needs the haversine helper
+    code = "import sys, spatial_index; assert 'locations' not in sys.modules and 'APIs' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parents[1], check=True)
@@ -0,0 +1,84 @@
+import itertools
+import os
+import threading
+
+import pytest
+
+import image_fetcher
+from image_fetcher import ImageFetcher, LocalBucket
+
+
+@pytest.fixture
+def bucket_dir(tmp_path):
+    path = tmp_path / "bucket"
+    path.mkdir()
+    for name in "abc":
+        (path / f"{name}.jpg").write_bytes(name.encode() * 100)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # Every use gets a distinct time, so the LRU order doesn't depend on the clock resolution
+    ticks = itertools.count()
+    monkeypatch.setattr(image_fetcher.time, "time", lambda: float(next(ticks)))
+
+
+def make_fetcher(tmp_path, bucket_dir, max_bytes=10_000):
+    return ImageFetcher(LocalBucket(str(bucket_dir)), cache_dir=str(tmp_path / "cache"), max_bytes=max_bytes)
+
+
+def test_downloads_only_changed_blobs(tmp_path, bucket_dir):
+    fetcher = make_fetcher(tmp_path, bucket_dir)
+    path = fetcher.fetch_one("a.jpg")
+    fetcher.fetch_one("a.jpg")
+    assert (fetcher.downloads, fetcher.hits) == (1, 1)
+
+    blob = bucket_dir / "a.jpg"
+    stat = blob.stat()
+    blob.write_bytes(b"new" * 10)
+    os.utime(blob, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert open(fetcher.fetch(["a.jpg"])[0], "rb").read() == b"new" * 10
+    assert (fetcher.downloads, fetcher.hits) == (2, 1)
+
+    # The index saved by fetch survives a restart
+    restarted = make_fetcher(tmp_path, bucket_dir)
+    assert restarted.fetch_one("a.jpg") == path and restarted.hits == 1
+
+
+def test_missing_blob(tmp_path, bucket_dir):
+    with pytest.raises(FileNotFoundError):
+        make_fetcher(tmp_path, bucket_dir).fetch_one("missing.jpg")
+
+
+def test_evicts_least_recently_used_beyond_budget(tmp_path, bucket_dir):
+    fetcher = make_fetcher(tmp_path, bucket_dir, max_bytes=250)
+    fetcher.fetch(["a.jpg", "b.jpg"])
+    fetcher.fetch_one("a.jpg")  # b is now the least recently used
+    fetcher.fetch(["c.jpg"])
+    assert sorted(os.listdir(fetcher.cache_dir)) == ["a.jpg", "c.jpg", "index.json"]
+
+
+def test_pinned_images_survive_concurrent_eviction(tmp_path, bucket_dir):
+    fetcher = make_fetcher(tmp_path, bucket_dir, max_bytes=100)
+    holding, done = threading.Barrier(3), threading.Event()
+    contents = {}
+
+    def request(names):
+        with fetcher.checkout(names) as paths:
+            holding.wait(5)  # both requests hold their images while the other one evicts
+            done.wait(5)
+            contents.update((name, open(path, "rb").read()) for name, path in zip(names, paths))
+
+    threads = [threading.Thread(target=request, args=(names,)) for names in (["a.jpg"], ["b.jpg", "c.jpg"])]
+    for thread in threads:
+        thread.start()
+    holding.wait(5)
+    fetcher.evict()
+    done.set()
+    for thread in threads:
+        thread.join(5)
+    assert contents == {name: name[0].encode() * 100 for name in ("a.jpg", "b.jpg", "c.jpg")}
+
+    fetcher.evict()  # nothing is pinned anymore
+    assert len(os.listdir(fetcher.cache_dir)) == 2  # the most recently used image and the index
@@ -0,0 +1,38 @@
+import pytest
+
+from yolo_funcs import read_label_file
+
+FIVE_COLUMNS = "0 0.5 0.5 0.1 0.2\n1 0.3 0.3 0.1 0.1\n0 0.7 0.2 0.1 0.1\n"
+SIX_COLUMNS = "0 0.5 0.5 0.1 0.2 0.91\n1 0.3 0.3 0.1 0.1 0.42\n12 0.7 0.2 0.1 0.1 0.88\n"
+
+
+def write(tmp_path, text: str, newline: str = "\n"):
+    path = tmp_path / "snap.txt"
+    path.write_bytes(text.replace("\n", newline).encode())
+    return str(path)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_five_columns(tmp_path, newline):
+    assert read_label_file(write(tmp_path, FIVE_COLUMNS, newline)) == {0: 2, 1: 1}
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_six_columns(tmp_path, newline):
+    counts = read_label_file(write(tmp_path, SIX_COLUMNS, newline))
+    assert counts[0] == counts[1] == counts[12] == 1 and sum(counts.values()) == 3
+
+
+def test_blank_lines_and_no_trailing_newline(tmp_path):
+    assert read_label_file(write(tmp_path, "\n" + FIVE_COLUMNS + "\n" + SIX_COLUMNS.rstrip("\n"), "\r\n"))[0] == 3
+
+
+def test_empty_and_missing_files(tmp_path):
+    assert read_label_file(write(tmp_path, "")) == {0: 0, 1: 0}
+    assert read_label_file(str(tmp_path / "missing.txt")) == {0: 0, 1: 0}
+
+
+@pytest.mark.parametrize("text", ["0 0.5 0.5 0.1\n", "0 0.5 0.5 0.1 0.2 0.9 7\n", "a 0.5 0.5 0.1 0.2\n"])
+def test_malformed_lines(tmp_path, text):
+    with pytest.raises(ValueError):
+        read_label_file(write(tmp_path, text))
@@ -0,0 +1,60 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import parking_dataset
+
+ROWS = [(51.041, -114.077, 5.0, {"9": 0.1, "10": None}), (51.042, -114.063, 7.5, {}),
+        (51.041, -114.077, 9.0, {"9": 0.9})]
+
+
+def write_csv(path, rows, mtime_ns):
+    lines = ["Geohash,Latitude_SW,Longitude_SW,AvgTimeToPark,SearchingByHour"]
+    for lat, lng, avg, searching in rows:
+        lines.append(f'g,{lat},{lng},{avg},"{json.dumps(searching).replace(chr(34), 2 * chr(34))}"')
+    path.write_text("\n".join(lines) + "\n")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    path = tmp_path / parking_dataset.DATASET_PATH
+    write_csv(path, ROWS, mtime_ns=10 ** 18)
+    monkeypatch.setattr(parking_dataset, "_dataset", None)
+    return path
+
+
+def test_row_lookup(csv_path):
+    dataset = parking_dataset.get_dataset(str(csv_path))
+    assert len(dataset) == 3
+    assert dataset.row_of(51.041, -114.077) == 0  # the first of the duplicated coordinates
+    assert dataset.row_of("51.042", "-114.063") == 1
+    assert dataset.row_of(51.0, -114.0) is None
+    assert dataset.searching_at(0, 9) == 0.1
+    assert dataset.searching_at(0, 10) is None and dataset.searching_at(1, 9) is None
+    with pytest.raises(ValueError):
+        dataset.avg_time_to_park[0] = 1.0  # a loaded dataset is never modified
+
+
+def test_reload_swaps_in_a_new_dataset(csv_path, monkeypatch):
+    monkeypatch.setattr(parking_dataset, "RELOAD_CHECK_INTERVAL", 0)
+    old = parking_dataset.get_dataset(str(csv_path))
+    assert parking_dataset.get_dataset(str(csv_path)) is old  # unchanged file
+
+    write_csv(csv_path, [(51.05, -114.07, 3.0, {})], mtime_ns=10 ** 18 + 1)
+    new = parking_dataset.get_dataset(str(csv_path))
+    assert new is not old and len(new) == 1 and new.row_of(51.05, -114.07) == 0
+    # A reader that fetched the old dataset keeps a consistent view of it
+    assert len(old) == 3 and old.row_of(51.041, -114.077) == 0
+    assert np.array_equal(old.avg_time_to_park, [5.0, 7.5, 9.0])
+
+
+def test_mtime_check_is_rate_limited(csv_path, monkeypatch):
+    monkeypatch.setattr(parking_dataset, "RELOAD_CHECK_INTERVAL", 3600)
+    old = parking_dataset.get_dataset(str(csv_path))
+    write_csv(csv_path, [(51.05, -114.07, 3.0, {})], mtime_ns=10 ** 18 + 1)
+    assert parking_dataset.get_dataset(str(csv_path)) is old  # checked less than an hour ago
+    monkeypatch.setattr(parking_dataset, "_checked_at", parking_dataset._checked_at - 3600)
+    assert len(parking_dataset.get_dataset(str(csv_path))) == 1
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+
+import locations as loc
+import parking_dataset
+from locations import Location
+from snapshot import SnapshotTable
+
+manager = pytest.importorskip("manager")
+import image_fetcher  # noqa: E402, needs firebase_admin like manager
+import occupancy  # noqa: E402
+import scoring  # noqa: E402
+import yolo_funcs  # noqa: E402
+
+CAMERAS = [(51.041, -114.077), (51.042, -114.063), (51.05, -114.07)]
+DESTINATION = Location(51.045, -114.063)
+
+
+@pytest.fixture
+def snaps_arr(tmp_path, monkeypatch):
+    searching = json.dumps({str(h): 0.1 for h in range(24)})
+    lines = ["Geohash,Latitude_SW,Longitude_SW,AvgTimeToPark,SearchingByHour"]
+    lines += [f'g,{lat},{lng},5.0,"{searching.replace(chr(34), 2 * chr(34))}"' for lat, lng in CAMERAS]
+    (tmp_path / parking_dataset.DATASET_PATH).write_text("\n".join(lines) + "\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(parking_dataset, "_dataset", None)
+    table = SnapshotTable.from_dataset(parking_dataset.get_dataset())
+    table.available_slots[:] = [3, 3, 3]
+    return table
+
+
+def travel_times_stub(monkeypatch, times: dict):
+    def get_travel_times(origins, destination):
+        return [times[(o.latitude, o.longitude)] for o in origins]
+    monkeypatch.setattr(loc, "get_travel_times", get_travel_times)
+
+
+def test_failed_travel_time_is_never_the_best(snaps_arr, monkeypatch):
+    # With the old -1 sentinel the failed snapshot got the highest grade
+    travel_times_stub(monkeypatch, {CAMERAS[0]: 9.0, CAMERAS[1]: None, CAMERAS[2]: 12.0})
+    ranked, avoided = manager.rank_snaps("Centre St", DESTINATION, snaps_arr, k=3, batch_size=1)
+    assert [snap.name for snap, grade in ranked] == [snaps_arr.name(0), snaps_arr.name(2)]
+    assert snaps_arr.grades[1] == -np.inf
+
+
+def test_every_travel_time_failed(snaps_arr, monkeypatch):
+    travel_times_stub(monkeypatch, {camera: None for camera in CAMERAS})
+    ranked, avoided = manager.rank_snaps("Centre St", DESTINATION, snaps_arr)
+    assert ranked == [] and avoided == 0
+
+
+class FakeFetcher:
+    def __init__(self, slow_name, graded):
+        self.slow_name, self.graded = slow_name, graded
+        self.graded_before_slow_download = None
+
+    def fetch_one(self, name):
+        if name == self.slow_name:
+            self.graded_before_slow_download = self.graded.wait(5)
+        return name
+
+    def pin(self, names):
+        pass
+
+    def release(self, names):
+        pass
+
+    def evict(self):
+        pass
+
+
+def test_async_grades_each_snapshot_once_detected(snaps_arr, monkeypatch):
+    names = snaps_arr.names
+    graded, batches = threading.Event(), []
+
+    def grade_all(*args, **kwargs):
+        graded.set()
+        return grade_all_orig(*args, **kwargs)
+
+    class FakeDetector:
+        def count(self, img_paths):
+            batches.append(list(img_paths))
+            return [{yolo_funcs.AVAILABLE_CLASS: 2, yolo_funcs.UNAVAILABLE_CLASS: 1} for _ in img_paths]
+
+    grade_all_orig = scoring.grade_all
+    fetcher = FakeFetcher(names[2] + ".jpg", graded)
+    monkeypatch.setattr(scoring, "grade_all", grade_all)
+    monkeypatch.setattr(image_fetcher, "get_fetcher", lambda: fetcher)
+    monkeypatch.setattr(yolo_funcs, "get_detector", FakeDetector)
+    monkeypatch.setattr(occupancy, "_table", occupancy.OccupancyTable())
+    monkeypatch.setattr(loc, "get_lat_long", lambda address: (DESTINATION.latitude, DESTINATION.longitude))
+    monkeypatch.setattr(manager, "report_best", lambda snap: snap.name)
+    travel_times_stub(monkeypatch, {CAMERAS[0]: 9.0, CAMERAS[1]: 3.0, CAMERAS[2]: None})
+
+    assert asyncio.run(manager.manager_async("Centre St", radius=5)) == names[1]
+    # The slow image was still downloading when the others were detected and graded
+    assert fetcher.graded_before_slow_download
+    assert sorted(name for batch in batches for name in batch) == sorted(name + ".jpg" for name in names)
+    assert batches[-1] == [names[2] + ".jpg"]
@@ -0,0 +1,29 @@
+import numpy as np
+
+import scoring
+
+
+def test_missing_travel_times_are_never_ranked():
+    slots = [3, 3, 3, 0]
+    avg_time_to_park = [5.0, 5.0, 5.0, 5.0]
+    searching_by_hour = [0.1, np.nan, 0.1, 0.1]
+    grades = scoring.grade_all(slots, avg_time_to_park, searching_by_hour, [5.0, None, -1, np.nan])
+    assert grades[0] > 0
+    assert grades[1] == grades[2] == -np.inf
+    assert grades[3] == 0  # no available slots
+    assert scoring.top_k(grades, 4).tolist() == [0]
+
+
+def test_default_profile_grade():
+    # 0.6 * slots + 0.1 * (60 - avg time to park) - 6 * searching + 0.2 * (60 - travel time)
+    grade = scoring.grade_all(3, 5.0, 0.1, 5.0)[0]
+    assert np.isclose(grade, 0.6 * 3 + 0.1 * 55 - 6 * 0.1 + 0.2 * 55)
+    # 0.65 * slots + 0.1 * (60 - avg time to park) + 0.25 * (60 - travel time) without the searching value
+    grade = scoring.grade_all(3, 5.0, np.nan, 5.0)[0]
+    assert np.isclose(grade, 0.65 * 3 + 0.1 * 55 + 0.25 * 55)
+
+
+def test_top_k_is_stable_and_positive():
+    grades = np.array([1.0, 2.0, 2.0, 0.0, -np.inf, 3.0])
+    assert scoring.top_k(grades, 3).tolist() == [5, 1, 2]
+    assert scoring.top_k(grades, 10).tolist() == [5, 1, 2, 0]
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from geo import get_distances
+from spatial_index import GridIndex
+
+
+def brute_force(latitudes, longitudes, latitude, longitude, radius):
+    return np.flatnonzero(get_distances(latitude, longitude, latitudes, longitudes) < radius)
+
+
+@pytest.mark.parametrize("cell_size", [0.01, 0.05])
+def test_matches_brute_force_in_a_city(cell_size):
+    rng = np.random.default_rng(0)
+    latitudes, longitudes = rng.uniform(50.9, 51.2, 2000), rng.uniform(-114.3, -113.9, 2000)
+    index = GridIndex(latitudes, longitudes, cell_size)
+    for _ in range(200):
+        latitude, longitude, radius = rng.uniform(50.85, 51.25), rng.uniform(-114.35, -113.85), rng.uniform(0.1, 5)
+        expected = brute_force(latitudes, longitudes, latitude, longitude, radius)
+        assert np.array_equal(index.query(latitude, longitude, radius), expected)
+
+
+def test_matches_brute_force_across_the_antimeridian():
+    rng = np.random.default_rng(1)
+    latitudes = rng.uniform(-89, 89, 3000)
+    longitudes = np.concatenate([rng.uniform(179, 180, 1000), rng.uniform(-180, -179, 1000),
+                                 rng.uniform(-180, 180, 1000)])
+    index = GridIndex(latitudes, longitudes, cell_size=0.5)
+    queries = [(0, 179.99, 50), (0, -179.99, 50), (65, 180, 300), (-89.5, 10, 500), (89.5, -170, 500)]
+    queries += [(rng.uniform(-89, 89), rng.choice([-1, 1]) * rng.uniform(179, 180), rng.uniform(1, 2000))
+                for _ in range(100)]
+    for latitude, longitude, radius in queries:
+        expected = brute_force(latitudes, longitudes, latitude, longitude, radius)
+        assert np.array_equal(index.query(latitude, longitude, radius), expected), (latitude, longitude, radius)
+
+
+def test_empty_index_and_no_match():
+    assert len(GridIndex([], []).query(51.0, -114.0, 1)) == 0
+    assert len(GridIndex([51.0], [-114.0]).query(40.0, -114.0, 1)) == 0
@@ -0,0 +1,59 @@
+import pytest
+
+import locations as loc
+from locations import Location
+from maps_stub import MapsStubServer
+
+DESTINATION = "Centre St"
+PLACES = {DESTINATION: (51.045, -114.063)}
+
+
+def origins(n: int) -> list:
+    return [Location(51.0 + i / 1000, -114.0) for i in range(n)]
+
+
+def test_travel_times_in_one_request_per_chunk():
+    points = origins(loc.DISTANCE_MATRIX_MAX_ORIGINS + 5)
+    with MapsStubServer(places=PLACES) as stub:
+        times = loc.get_travel_times(points, DESTINATION)
+    assert stub.requests["distancematrix"] == 2
+    assert all(t is not None and t > 0 for t in times)
+    assert times[0] == pytest.approx(stub.travel_seconds("51.0,-114.0", DESTINATION) / 60)
+
+
+def test_partial_failure_gives_none_for_the_failed_origins():
+    points = origins(4)
+    unreachable = {(points[1].latitude, points[1].longitude), (points[3].latitude, points[3].longitude)}
+    with MapsStubServer(places=PLACES, unreachable=unreachable):
+        times = loc.get_travel_times(points, DESTINATION)
+    assert times[1] is None and times[3] is None
+    assert times[0] > 0 and times[2] > 0
+
+
+def test_refused_chunk_gives_none_for_every_origin():
+    points = origins(loc.DISTANCE_MATRIX_MAX_ORIGINS + 5)
+    with MapsStubServer(places=PLACES, matrix_status="OVER_QUERY_LIMIT") as stub:
+        times = loc.get_travel_times(points, DESTINATION)
+    assert stub.requests["distancematrix"] == 2
+    assert times == [None] * len(points)
+
+
+def test_network_error_gives_none_for_every_origin():
+    stub = MapsStubServer(places=PLACES)
+    url = stub.url
+    stub._server.server_close()  # nothing listens on the port anymore
+    previous_url, loc.MAPS_API_URL = loc.MAPS_API_URL, url
+    try:
+        times = loc.get_travel_times(origins(3), DESTINATION)
+    finally:
+        loc.MAPS_API_URL = previous_url
+    assert times == [None] * 3
+
+
+@pytest.mark.parametrize("fallback_time", [-1, None])
+def test_grade_snap_without_travel_time_is_not_a_candidate(monkeypatch, fallback_time):
+    manager = pytest.importorskip("manager")
+    from snapshot import Snapshot
+    monkeypatch.setattr(loc, "get_address", lambda location: DESTINATION)
+    monkeypatch.setattr(loc, "get_travel_time", lambda origin, destination: fallback_time)
+    assert manager.gradeSnap(DESTINATION, Snapshot("51.0,-114.0", Location(51.0, -114.0), 3), None) == 0
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+fake_telegram = pytest.importorskip("fake_telegram")
+webhook_bot = pytest.importorskip("webhook_bot")
+
+SECRET = "s3cret"
+
+
+async def pipeline(address: str) -> str:
+    await asyncio.sleep(0.05)
+    return "near " + address
+
+
+async def serve_webhook(chats: int, secret_token: str, answered: int):
+    api = fake_telegram.FakeBotApi()
+    await api.start()
+    bot = webhook_bot.create_bot("123:test", pipeline=pipeline, max_searches=chats)
+    runner = web.AppRunner(webhook_bot.create_app(bot, secret_token=SECRET))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}{webhook_bot.WEBHOOK_PATH}"
+    try:
+        results = await fake_telegram.post_updates(url, fake_telegram.fake_updates(chats), 100, secret_token)
+        answers = []
+        for _ in range(500):  # the updates are processed in background tasks after the webhook answered
+            answers = [(chat_id, text) for method, chat_id, text in api.sent
+                       if text is not None and text.startswith("The best parking")]
+            if len(answers) == answered:
+                break
+            await asyncio.sleep(0.01)
+        return results, answers, api.sent
+    finally:
+        await bot.close_session()
+        await runner.cleanup()
+        await api.stop()
+
+
+def test_concurrent_updates_are_all_answered():
+    results, answers, sent = asyncio.run(serve_webhook(200, SECRET, answered=200))
+    assert len(results) == 400 and all(status == 200 for status, _ in results)
+    assert sorted(chat_id for chat_id, _ in answers) == list(range(1, 201))
+    addresses = fake_telegram.ADDRESSES
+    assert all(text.endswith("near " + addresses[(chat_id - 1) % len(addresses)]) for chat_id, text in answers)
+
+
+def test_wrong_secret_token_is_rejected():
+    results, answers, sent = asyncio.run(serve_webhook(3, "wrong", answered=0))
+    assert all(status == 403 for status, _ in results)
+    assert sent == []
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+
+import firebase_admin
+from aiohttp import web
+from firebase_admin import credentials
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+import APIs
+import manager
+import occupancy
+import yolo_funcs
+
+WEBHOOK_PATH = '/webhook'
+MAX_SEARCHES = 64  # pipeline runs in flight per process before the bot replies that it is busy
+
+
+def create_bot(token: str, pipeline=manager.manager_async, max_searches: int = MAX_SEARCHES) -> AsyncTeleBot:
+    """
+    Creates the async Telegram bot with the same commands as the polling bot of main.py.
+
+    Each address request awaits the async ranking pipeline, so the event loop keeps serving other chats while it
+    runs. Once max_searches requests are in flight, new ones get a busy reply.
+
+    :param: token: The Telegram bot API token.
+    :type: token: str
+    :param: pipeline: The coroutine function that returns the best parking address of a destination address.
+    :param: max_searches: The number of concurrent pipeline runs.
+    :type: max_searches: int
+    :return: The bot.
+    :rtype: AsyncTeleBot
+    """
+    bot = AsyncTeleBot(token)
+    searches = asyncio.Semaphore(max_searches)
+
+    @bot.message_handler(commands=["start"])
+    async def start(message):
+        await bot.send_message(message.chat.id, "Hello! I am the telegram bot. \nTo get started - send an address:")
+
+    @bot.message_handler(func=lambda message: message.text is not None and message.text.startswith("address: "))
+    async def greet(message):
+        if searches.locked():
+            await bot.send_message(message.chat.id, "The bot is busy right now. Please try again in a minute.")
+            return
+        async with searches:
+            address_from_bot = message.text[9:]
+            await bot.send_message(message.chat.id, "We are searchig for the best parking for you..... Please wait.  ")
+            await bot.send_animation(message.chat.id, "https://media.tenor.com/7NX24XoJX0MAAAAM/loading-fast.gif")
+            try:
+                best_address = await pipeline(address_from_bot)
+            except Exception as e:
+                print(f"Failed to find a parking for chat {message.chat.id}. Error: {e}")
+                await bot.send_message(message.chat.id,
+                                       "Sorry, something went wrong while searching for a parking. Please try again.")
+                return
+            await bot.send_message(message.chat.id, "The best parking for you available in: " + str(best_address))
+
+    return bot
+
+
+def create_app(bot: AsyncTeleBot, path: str = WEBHOOK_PATH, secret_token: str | None = None) -> web.Application:
+    """
+    Creates the aiohttp application that receives the Telegram updates of the bot over HTTP.
+
+    The update is acknowledged right away and processed in a background task, so Telegram never waits for a search.
+
+    :param: bot: The bot that processes the updates.
+    :type: bot: AsyncTeleBot
+    :param: path: The URL path of the webhook.
+    :type: path: str
+    :param: secret_token: The secret token given to set_webhook, checked against the header Telegram sends with
+            every update. None accepts every request.
+    :type: secret_token: str or None
+    :return: The web application.
+    :rtype: web.Application
+    """
+    tasks = set()  # keep a reference to the running tasks so they aren't garbage collected
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret_token is not None and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            return web.Response(status=403)
+        update = types.Update.de_json(await request.json())
+        task = asyncio.create_task(bot.process_new_updates([update]))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', required=True, help='public HTTPS URL of the webhook, e.g. https://host/webhook')
+    parser.add_argument('--host', default='0.0.0.0', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--secret-token', default=None, help='secret token checked on every update')
+    parser.add_argument('--max-searches', type=int, default=MAX_SEARCHES, help='concurrent pipeline runs')
+    return parser.parse_args()
+
+
+def main(opt):
+    cred = credentials.Certificate("./key.json")
+    firebase_admin.initialize_app(cred, {'storageBucket': 'final-project-cb673.appspot.com'})
+    yolo_funcs.get_detector()  # load the YOLOv5 weights once, before serving requests
+    manager.get_camera_index()
+    occupancy.OccupancyDaemon().start()
+
+    bot = create_bot(APIs.Telegram_Bot_API_TOKEN, max_searches=opt.max_searches)
+    app = create_app(bot, secret_token=opt.secret_token)
+
+    async def set_webhook(app):
+        await bot.set_webhook(url=opt.url, secret_token=opt.secret_token)
+
+    async def close_session(app):
+        await bot.close_session()
+
+    app.on_startup.append(set_webhook)
+    app.on_cleanup.append(close_session)
+    web.run_app(app, host=opt.host, port=opt.port)
+
+
+if __name__ == '__main__':
+    main(parse_opt())
@@ -1,33 +1,223 @@
 import os
 import glob
+import subprocess
+import sys
+import threading
 
+import numpy as np
+import torch
 
-def get_parking_num(pic_name: str) -> int:
+YOLO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yolov5-master')
+if YOLO_ROOT not in sys.path:
+    sys.path.append(YOLO_ROOT)  # make the YOLOv5 'models' and 'utils' packages importable
+
+from models.common import DetectMultiBackend
+from utils.augmentations import letterbox
+from utils.general import check_img_size, cv2, non_max_suppression, scale_boxes
+from utils.torch_utils import select_device, smart_inference_mode
+
+from detection_cache import DetectionCache, detection_key, get_detection_cache, image_hash, weights_hash
+
+WEIGHTS_PATH = 'yolov5-master/runs/train/yolov5x_results/weights/best.pt'
+LABELS_DIR = 'yolov5-master/runs/detect/exp/labels'  # output folder of run_yolov5
+DETECT_IMGSZ = (640, 640)  # detect.py defaults used by run_yolov5
+DETECT_CONF_THRES = 0.25
+DETECT_IOU_THRES = 0.45
+DETECT_MAX_DET = 1000
+AVAILABLE_CLASS = 0  # class index of a free parking slot
+UNAVAILABLE_CLASS = 1  # class index of a taken parking slot
+
+
+class ParkingDetector:
+    """
+    Represents a YOLOv5 parking slots model that is loaded and warmed up once, and kept in memory to count the
+    available and unavailable parking slots in images without spawning a new detect.py process per request.
+    """
+    def __init__(self, weights=WEIGHTS_PATH, imgsz=640, conf_thres=0.25, iou_thres=0.45, max_det=1000, device='',
+                 cache: DetectionCache | None = None, batch_size: int = 8):
+        self.device = select_device(device)
+        self.model = DetectMultiBackend(weights, device=self.device)
+        self.cache = cache  # None runs every image through the model
+        self.weights_digest = weights_hash(weights) if os.path.isfile(weights) else str(weights)
+        self.names = self.model.names
+        self.imgsz = check_img_size((imgsz, imgsz) if isinstance(imgsz, int) else imgsz, s=self.model.stride)
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.max_det = max_det
+        self.batch_size = batch_size  # images stacked into one forward pass
+        self._lock = threading.Lock()  # the model is shared between the bot's threads
+        self.model.warmup(imgsz=(1, 3, *self.imgsz))
+
+    def _preprocess(self, image: np.ndarray) -> np.ndarray:
+        im = letterbox(image, self.imgsz, stride=self.model.stride, auto=self.model.pt)[0]  # padded resize
+        return np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+
+    def _to_tensor(self, ims: list) -> torch.Tensor:
+        im = torch.from_numpy(np.stack(ims)).to(self.model.device)
+        im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32
+        return im / 255  # 0 - 255 to 0.0 - 1.0
+
+    @smart_inference_mode()
+    def count(self, images, batch_size: int | None = None) -> list[dict]:
+        """
+        Counts the detected objects of every class in each of the given images.
+
+        When the detector has a cache, an image whose content was already detected with the same weights, inference
+        size and thresholds is answered from the cache without running the model. The other images are letterboxed,
+        grouped by shape and stacked into batches, so every batch takes a single forward pass and a single NMS call.
+
+        :param: images: Image paths, or BGR images already loaded into numpy arrays (as returned by cv2.imread).
+        :type: images: list[str | np.ndarray]
+        :param: batch_size: The maximum number of images of a forward pass, the detector's batch_size by default.
+        :type: batch_size: int or None
+        :return: For each image, in order, a dict mapping every class index of the model to its number of detections.
+        :rtype: list[dict]
+        """
+        batch_size = batch_size or self.batch_size
+        counts, keys, shapes = [None] * len(images), [None] * len(images), [None] * len(images)
+        groups = {}  # letterboxed shape -> indices and letterboxed images of the images to detect
+        for i, image in enumerate(images):
+            if self.cache is not None:
+                keys[i] = detection_key(image_hash(image), self.weights_digest, self.imgsz, self.conf_thres,
+                                        self.iou_thres, self.max_det, 'detector')
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    counts[i] = cached["counts"]
+                    continue
+
+            if isinstance(image, (str, os.PathLike)):
+                path = image
+                image = cv2.imread(str(path))  # BGR
+                assert image is not None, f'Image Not Found {path}'
+            shapes[i] = image.shape  # the decoded image itself isn't kept
+            im = self._preprocess(image)
+            group = groups.setdefault(im.shape, ([], []))
+            group[0].append(i)
+            group[1].append(im)
+
+        for indices, ims in groups.values():
+            for start in range(0, len(indices), batch_size):
+                im = self._to_tensor(ims[start:start + batch_size])
+                with self._lock:
+                    pred = self.model(im)
+                pred = non_max_suppression(pred, self.conf_thres, self.iou_thres, max_det=self.max_det, batched=True)
+                for i, det in zip(indices[start:start + batch_size], pred):
+                    counts[i] = dict(enumerate(torch.bincount(det[:, 5].long(), minlength=len(self.names)).tolist()))
+                    if keys[i] is not None:
+                        det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shapes[i]).round()  # to original pixels
+                        self.cache.set(keys[i], counts[i], det.tolist())
+        return counts
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector(**kwargs) -> ParkingDetector:
+    """
+    Returns the process-wide parking detector, loading the model weights on first use.
+
+    Calling this once at startup moves the weights loading and warmup out of the first request.
+
+    :param: kwargs: Arguments passed to ParkingDetector when it is created. It uses the shared detection cache unless
+            another cache is given.
+    :return: The shared parking detector.
+    :rtype: ParkingDetector
+    """
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            kwargs.setdefault("cache", get_detection_cache())
+            _detector = ParkingDetector(**kwargs)
+        return _detector
+
+
+def get_parking_num(pic_name: str, image_path: str | None = None) -> int:
     """
     Gets the number of parking slots from a YOLOv5 object detection output file.
 
     This function takes the name of a YOLOv5 object detection output file as input and reads the file to
     count the number of parking slots detected in the image. The YOLOv5 output file is expected to be in a
     specific format with one line for each detected object, and each line containing the object class and
-    bounding box coordinates.
+    bounding box coordinates (and the confidence, with --save-conf).
 
     :param: pic_name: Name of the YOLOv5 object detection output file without the file extension.
     :type: pic_name: str
+    :param: image_path: The detected image. When given, the shared detection cache is consulted first, and the counts
+            read from the output file are stored in it.
+    :type: image_path: str or None
     :return: Number of parking slots detected in the image.
     :rtype: int
     """
-    num_of_park = 0
-    with open('yolov5-master/runs/detect/exp/labels/' + pic_name + ".txt", 'r') as f:
-        for line in f:
-            values = line.split()
-            integers = []
+    key = None
+    if image_path is not None and os.path.isfile(WEIGHTS_PATH):
+        key = detection_key(image_hash(image_path), weights_hash(WEIGHTS_PATH), DETECT_IMGSZ, DETECT_CONF_THRES,
+                            DETECT_IOU_THRES, DETECT_MAX_DET, 'detect.py')
+        cached = get_detection_cache().get(key)
+        if cached is not None:
+            return cached["counts"].get(AVAILABLE_CLASS, 0)
+
+    counts = read_label_file(os.path.join(LABELS_DIR, pic_name + ".txt"))
+    if key is not None:
+        get_detection_cache().set(key, counts)
+    return counts[AVAILABLE_CLASS]
+
+
+def label_classes(data: bytes) -> np.ndarray:
+    """
+    Parses the class indices of YOLOv5 label lines with NumPy, without splitting the lines in Python.
 
-            for i in range(0, len(values), 5):
-                if values[i].isdigit():
-                    integers.append(int(values[i]))
-                    if int(values[i]) == 0:
-                        num_of_park = num_of_park + 1
-    return num_of_park
+    Each line is one detection: the class index followed by the box (class x y w h), and by the confidence when
+    detect.py was run with --save-conf (class x y w h conf). Only the first column of each line is decoded, from the
+    positions of the line breaks and spaces in the raw bytes. Lines may end with '\n' or '\r\n'.
+
+    :param: data: The content of a label file, every line (including the last one) ending with a newline.
+    :type: data: bytes
+    :return: The class index of every non-empty line, in order.
+    :rtype: np.ndarray
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_ends = line_ends - (buf[np.maximum(line_ends - 1, 0)] == ord('\r')) * (line_ends > starts)  # CRLF
+    non_empty = starts < line_ends
+    starts, line_ends = starts[non_empty], line_ends[non_empty]
+
+    spaces = np.flatnonzero(buf == ord(' '))
+    first_space = np.searchsorted(spaces, starts)
+    num_columns = np.searchsorted(spaces, line_ends) - first_space + 1
+    if not np.isin(num_columns, (5, 6)).all():
+        raise ValueError("Every label line must have 5 columns (class x y w h) or 6 columns (class x y w h conf)")
+
+    lengths = spaces[first_space] - starts
+    classes = np.zeros(len(starts), dtype=np.int64)
+    for d in range(int(lengths.max()) if len(lengths) else 0):
+        has_digit = lengths > d
+        digits = buf[starts[has_digit] + d].astype(np.int64) - ord('0')
+        if ((digits < 0) | (digits > 9)).any():
+            raise ValueError("The first column of every label line must be a class index")
+        classes[has_digit] = classes[has_digit] * 10 + digits
+    return classes
+
+
+def read_label_file(label_path: str) -> dict:
+    """
+    Counts the detections of every class in a YOLOv5 label file, with or without the --save-conf column. detect.py
+    doesn't write a label file for an image without detections, so a missing file counts as no detections.
+
+    :param: label_path: The path of the label file.
+    :type: label_path: str
+    :return: A dict mapping every class index up to the highest detected one (and at least AVAILABLE_CLASS and
+             UNAVAILABLE_CLASS) to its number of detections.
+    :rtype: dict
+    """
+    try:
+        with open(label_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b''
+    classes = label_classes(data + b'\n')
+    return dict(enumerate(np.bincount(classes, minlength=UNAVAILABLE_CLASS + 1).tolist()))
 
 
 def run_yolov5():
@@ -35,17 +225,17 @@ def run_yolov5():
     Runs YOLOv5 object detection on a specified folder of images.
 
     This function cleans the destination folder, sets the path to the folder containing relevant parking slots
-    images, and runs the YOLOv5 object detection command using the `os.system` function. The YOLOv5 object
-    detection command includes the path to the trained model weights, the option to save detection results in
-    text files, and the source path for the images to be detected.
+    images, and runs the YOLOv5 object detection command in a subprocess. The YOLOv5 object detection command
+    includes the path to the trained model weights, the option to save detection results in text files, and the
+    source path for the images to be detected.
 
     :return: None
     :rtype: None
     """
     clean_folder()  # Clean the destination folder before running object detection
     park_path = 'relevant_parking_slots'  # Set the path to the folder containing relevant parking slots images
-    os.system("py yolov5-master/detect.py --weights yolov5-master/runs/train/yolov5x_results/weights/best.pt"
-              " --save-txt --exist-ok --source " + park_path)  # Run YOLO
+    subprocess.run(["py", "yolov5-master/detect.py", "--weights", WEIGHTS_PATH, "--save-txt", "--exist-ok",
+                    "--source", park_path])  # Run YOLO
 
 
 def clean_folder():
@@ -60,7 +250,7 @@ def clean_folder():
     :return: None
     :rtype: None
     """
-    folder_path = "yolov5-master/runs/detect/exp/labels"  # Replace with your desired folder path
+    folder_path = LABELS_DIR
     # Get all files in the folder using glob
     files = glob.glob(os.path.join(folder_path, "*"))
     # Loop through each file and delete it
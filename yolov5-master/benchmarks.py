@@ -23,6 +23,7 @@ Requirements:
 
 Usage:
     $ python benchmarks.py --weights yolov5s.pt --img 640
+    $ python benchmarks.py --nms --batch-size 16  # batched vs per-image NMS micro-benchmark
 """
 
 import argparse
@@ -32,6 +33,7 @@ import time
 from pathlib import Path
 
 import pandas as pd
+import torch
 
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[0]  # YOLOv5 root directory
@@ -44,8 +46,8 @@ from models.experimental import attempt_load
 from models.yolo import SegmentationModel
 from segment.val import run as val_seg
 from utils import notebook_init
-from utils.general import LOGGER, check_yaml, file_size, print_args
-from utils.torch_utils import select_device
+from utils.general import LOGGER, check_yaml, file_size, non_max_suppression, print_args
+from utils.torch_utils import select_device, time_sync
 from val import run as val_det
 
 
@@ -143,6 +145,41 @@ def test(
     return py
 
 
+def nms(
+        batch_size=16,  # batch size
+        imgsz=640,  # inference size (pixels)
+        device='',  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+        nc=80,  # number of classes
+        conf_thres=0.25,  # confidence threshold
+        iou_thres=0.45,  # NMS IoU threshold
+        n=20,  # timed runs
+        **kwargs,  # other options
+):
+    # Micro-benchmark batched NMS (all images in one call) against the per-image loop on random predictions
+    device = select_device(device)
+    torch.manual_seed(0)
+    na = 3 * sum((imgsz // s) ** 2 for s in (8, 16, 32))  # anchors, 25200 at 640
+    p = torch.rand(batch_size, na, 5 + nc, device=device)  # xywh, obj, cls
+    p[..., :2] *= imgsz  # xy
+    p[..., 2:4] = p[..., 2:4] * imgsz / 4 + 2  # wh
+    p[..., 4] **= 200  # ~170 candidates per image at conf 0.25, ~900 at 0.001, as with a trained model
+    y, out = [], []
+    for batched in True, False:
+        out.append(non_max_suppression(p.clone(), conf_thres, iou_thres, batched=batched))  # warmup
+        dt = []
+        for _ in range(n):
+            x = p.clone()
+            t = time_sync()
+            non_max_suppression(x, conf_thres, iou_thres, batched=batched)
+            dt.append((time_sync() - t) * 1E3)  # ms
+        y.append(['batched' if batched else 'per-image', sum(len(x) for x in out[-1]), min(dt), min(dt) / batch_size])
+    assert all(torch.equal(a, b) for a, b in zip(*out)), 'batched and per-image NMS results differ'
+    py = pd.DataFrame(y, columns=['NMS', 'Detections', 'Time (ms)', 'Time per image (ms)'])
+    LOGGER.info(f'\nNMS benchmark, {batch_size} images of {na} anchors, {nc} classes, identical results')
+    LOGGER.info(str(py.round(3)))
+    return py
+
+
 def parse_opt():
     parser = argparse.ArgumentParser()
     parser.add_argument('--weights', type=str, default=ROOT / 'yolov5s.pt', help='weights path')
@@ -154,6 +191,7 @@ def parse_opt():
     parser.add_argument('--test', action='store_true', help='test exports only')
     parser.add_argument('--pt-only', action='store_true', help='test PyTorch only')
     parser.add_argument('--hard-fail', nargs='?', const=True, default=False, help='Exception on error or < min metric')
+    parser.add_argument('--nms', action='store_true', help='batched vs per-image NMS micro-benchmark only')
     opt = parser.parse_args()
     opt.data = check_yaml(opt.data)  # check YAML
     print_args(vars(opt))
@@ -161,7 +199,10 @@ def parse_opt():
 
 
 def main(opt):
-    test(**vars(opt)) if opt.test else run(**vars(opt))
+    if vars(opt).pop('nms'):
+        nms(**vars(opt))
+    else:
+        test(**vars(opt)) if opt.test else run(**vars(opt))
 
 
 if __name__ == '__main__':
@@ -12,6 +12,8 @@ import os
 import random
 import shutil
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from itertools import repeat
 from multiprocessing.pool import Pool, ThreadPool
 from pathlib import Path
@@ -93,6 +95,25 @@ def exif_transpose(image):
     return image
 
 
+def imread_reduced(path, img_size=640):
+    # Decodes a JPEG at 1/2, 1/4 or 1/8 resolution (libjpeg DCT scaling) while it stays at least img_size, i.e. a
+    # 1920x1080 frame is decoded as 960x540 for --imgsz 640. Returns (im, exif-corrected original hw), im is None if the
+    # image is not found
+    h0 = w0 = None
+    if path.split('.')[-1].lower() in ('jpg', 'jpeg'):
+        with contextlib.suppress(Exception):
+            with Image.open(path) as img:
+                w0, h0 = exif_size(img)  # header only, cv2 also applies the EXIF orientation
+    if h0 is None:  # not a JPEG or unreadable header
+        im = cv2.imread(path)  # BGR
+        return im, (im.shape[:2] if im is not None else None)
+    h, w = (img_size, img_size) if isinstance(img_size, int) else img_size  # letterbox size
+    r = min(h / h0, w / w0)  # letterbox ratio
+    f = next((f for f in (8, 4, 2) if f * r <= 1), 1)  # largest reduction that does not upsample
+    flag = getattr(cv2, f'IMREAD_REDUCED_COLOR_{f}') if f > 1 else cv2.IMREAD_COLOR
+    return cv2.imread(path, flag), (h0, w0)  # BGR
+
+
 def seed_worker(worker_id):
     # Set dataloader worker seed https://pytorch.org/docs/stable/notes/randomness.html#dataloader
     worker_seed = torch.initial_seed() % 2 ** 32
@@ -116,7 +137,8 @@ def create_dataloader(path,
                       quad=False,
                       prefix='',
                       shuffle=False,
-                      seed=0):
+                      seed=0,
+                      reduced_decode=False):
     if rect and shuffle:
         LOGGER.warning('WARNING ⚠️ --rect is incompatible with DataLoader shuffle, setting shuffle=False')
         shuffle = False
@@ -133,7 +155,8 @@ def create_dataloader(path,
             stride=int(stride),
             pad=pad,
             image_weights=image_weights,
-            prefix=prefix)
+            prefix=prefix,
+            reduced_decode=reduced_decode)
 
     batch_size = min(batch_size, len(dataset))
     nd = torch.cuda.device_count()  # number of CUDA devices
@@ -238,7 +261,7 @@ class LoadScreenshots:
 
 class LoadImages:
     # YOLOv5 image/video dataloader, i.e. `python detect.py --source image.jpg/vid.mp4`
-    def __init__(self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):
+    def __init__(self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1, reduced_decode=False):
         if isinstance(path, str) and Path(path).suffix == '.txt':  # *.txt file with img/vid/dir on each line
             path = Path(path).read_text().rsplit()
         files = []
@@ -266,6 +289,8 @@ class LoadImages:
         self.auto = auto
         self.transforms = transforms  # optional
         self.vid_stride = vid_stride  # video frame-rate stride
+        self.reduced_decode = reduced_decode  # decode large JPEGs at reduced resolution
+        self.shapes0 = {}  # original hw of the images decoded at reduced resolution, popped by the consumer
         if any(videos):
             self._new_video(videos[0])  # new video
         else:
@@ -304,18 +329,29 @@ class LoadImages:
         else:
             # Read image
             self.count += 1
-            im0 = cv2.imread(path)  # BGR
-            assert im0 is not None, f'Image Not Found {path}'
+            im0 = self._read_image(path)
             s = f'image {self.count}/{self.nf} {path}: '
 
-        if self.transforms:
-            im = self.transforms(im0)  # transforms
+        return path, self._preprocess(im0), im0, self.cap, s
+
+    def _read_image(self, path):
+        # Decode an image file
+        if self.reduced_decode:
+            im0, shape0 = imread_reduced(path, self.img_size)
+            if im0 is not None and im0.shape[:2] != shape0:
+                self.shapes0[path] = shape0
         else:
-            im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # padded resize
-            im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
-            im = np.ascontiguousarray(im)  # contiguous
+            im0 = cv2.imread(path)  # BGR
+        assert im0 is not None, f'Image Not Found {path}'
+        return im0
 
-        return path, im, im0, self.cap, s
+    def _preprocess(self, im0):
+        # Letterbox (or transform) an original image to the model input
+        if self.transforms:
+            return self.transforms(im0)  # transforms
+        im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # padded resize
+        im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+        return np.ascontiguousarray(im)  # contiguous
 
     def _new_video(self, path):
         # Create a new video capture object
@@ -339,6 +375,137 @@ class LoadImages:
         return self.nf  # number of files
 
 
+class LoadMemoryImages(LoadImages):
+    # YOLOv5 in-memory image dataloader, i.e. `detect.run(source=[('cam.jpg', jpeg_bytes), ('cam2.jpg', bgr_array)])`
+    # Items are (name, image) pairs (or a {name: image} dict), images are BGR arrays, encoded bytes or file-like objects
+    def __init__(self, source, img_size=640, stride=32, auto=True, transforms=None):
+        self.source = source.items() if isinstance(source, dict) else source
+        self.img_size = img_size
+        self.stride = stride
+        self.auto = auto
+        self.transforms = transforms  # optional
+        self.nf = len(source) if hasattr(source, '__len__') else None  # None for generators
+        self.mode = 'image'
+        self.cap = None
+        self.count = 0
+
+    def __iter__(self):
+        self.count = 0
+        for item in self.source:
+            name, image = item if isinstance(item, tuple) else (getattr(item, 'name', None), item)
+            self.count += 1
+            name = str(name or f'image{self.count}.jpg')
+            im0 = self._decode(image, name)
+            yield name, self._preprocess(im0), im0, None, f"image {self.count}/{self.nf or '?'} {name}: "
+
+    @staticmethod
+    def _decode(image, name):
+        # Decode an image from memory, without a filesystem round-trip
+        if isinstance(image, np.ndarray):
+            return image  # already BGR
+        if hasattr(image, 'read'):
+            image = image.read()  # file-like
+        im0 = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR) if len(image) else None  # BGR
+        assert im0 is not None, f'Image Not Decoded {name}'
+        return im0
+
+    def __len__(self):
+        return self.nf or 0  # number of images
+
+
+class LoadImagesPrefetch:
+    # YOLOv5 prefetching wrapper of LoadImages, i.e. `python detect.py --source path/ --prefetch 8`
+    # Decodes and letterboxes the next images in a thread pool (cv2 releases the GIL) while the current one is inferred
+    def __init__(self, dataset, prefetch=8, workers=NUM_THREADS):
+        self.dataset = dataset  # LoadImages
+        self.prefetch = prefetch  # images decoded ahead, bounds the queue
+        self.workers = max(min(workers, prefetch), 1)
+        self.mode = 'image'
+        self.frame = 0
+        self.count = 0
+        self.wait = 0.0  # seconds the consumer waited for decoded images
+        self.compute = 0.0  # seconds the consumer spent between images
+
+    def _load(self, path):
+        im0 = self.dataset._read_image(path)
+        return self.dataset._preprocess(im0), im0
+
+    def __iter__(self):
+        d = self.dataset
+        images = [f for f, video in zip(d.files, d.video_flag) if not video]
+        self.count = 0
+        with ThreadPoolExecutor(self.workers) as pool:
+            queue = deque((path, pool.submit(self._load, path)) for path in images[:self.prefetch])
+            while queue:
+                path, future = queue.popleft()
+                t = time.time()
+                im, im0 = future.result()  # in order
+                self.wait += time.time() - t
+                if self.count + self.prefetch < len(images):
+                    path_next = images[self.count + self.prefetch]
+                    queue.append((path_next, pool.submit(self._load, path_next)))
+                self.count += 1
+                self.mode = 'image'
+                t = time.time()
+                yield path, im, im0, None, f'image {self.count}/{d.nf} {path}: '
+                self.compute += time.time() - t
+
+        # Videos are decoded sequentially by LoadImages
+        d.count = len(images)
+        while True:
+            t = time.time()
+            try:
+                item = next(d)
+            except StopIteration:
+                break
+            self.wait += time.time() - t
+            self.mode, self.frame, self.count = d.mode, d.frame, d.count
+            t = time.time()
+            yield item
+            self.compute += time.time() - t
+
+    def summary(self):
+        return f'{self.wait:.2f}s waiting for images (I/O and decode), {self.compute:.2f}s compute'
+
+    def __len__(self):
+        return len(self.dataset)  # number of files
+
+
+class LoadImageBatches:
+    # YOLOv5 batched image dataloader, i.e. `python detect.py --source path/ --batch-size 8`
+    # Stacks images with the same letterboxed shape into (n, 3, h, w) batches, video frames pass through one by one
+    def __init__(self, dataset, batch_size=8):
+        self.dataset = dataset  # LoadImages
+        self.batch_size = batch_size
+        self.mode = 'image'
+        self.frame = 0
+
+    def __iter__(self):
+        buckets = {}  # letterboxed shape -> [(path, im, im0, s)]
+        for path, im, im0, vid_cap, s in self.dataset:
+            if self.dataset.mode != 'image':
+                for shape in list(buckets):
+                    yield self._batch(buckets.pop(shape))
+                self.mode, self.frame = self.dataset.mode, self.dataset.frame
+                yield [path], im[None], [im0], vid_cap, s
+                continue
+            bucket = buckets.setdefault(im.shape, [])
+            bucket.append((path, im, im0, s))
+            if len(bucket) == self.batch_size:
+                yield self._batch(buckets.pop(im.shape))
+        for shape in list(buckets):
+            yield self._batch(buckets.pop(shape))
+
+    def _batch(self, items):
+        self.mode = 'image'
+        paths, ims, im0s, ss = zip(*items)
+        s = ss[0] if len(ss) == 1 else f'{ss[0][:-2]} (+{len(ss) - 1} images): '
+        return list(paths), np.stack(ims), list(im0s), None, s
+
+    def __len__(self):
+        return len(self.dataset)  # number of files
+
+
 class LoadStreams:
     # YOLOv5 streamloader, i.e. `python detect.py --source 'rtsp://example.com/media.mp4'  # RTSP, RTMP, HTTP streams`
     def __init__(self, sources='file.streams', img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):
@@ -449,8 +616,10 @@ class LoadImagesAndLabels(Dataset):
                  stride=32,
                  pad=0.0,
                  min_items=0,
-                 prefix=''):
+                 prefix='',
+                 reduced_decode=False):
         self.img_size = img_size
+        self.reduced_decode = reduced_decode  # decode large JPEGs at reduced resolution in load_image
         self.augment = augment
         self.hyp = hyp
         self.image_weights = image_weights
@@ -728,16 +897,18 @@ class LoadImagesAndLabels(Dataset):
         # Loads 1 image from dataset index 'i', returns (im, original hw, resized hw)
         im, f, fn = self.ims[i], self.im_files[i], self.npy_files[i],
         if im is None:  # not cached in RAM
+            hw0 = None  # orig hw when decoded at reduced resolution
             if fn.exists():  # load npy
                 im = np.load(fn)
             else:  # read image
-                im = cv2.imread(f)  # BGR
+                im, hw0 = imread_reduced(f, self.img_size) if self.reduced_decode else (cv2.imread(f), None)  # BGR
                 assert im is not None, f'Image Not Found {f}'
-            h0, w0 = im.shape[:2]  # orig hw
+            h0, w0 = hw0 or im.shape[:2]  # orig hw
             r = self.img_size / max(h0, w0)  # ratio
-            if r != 1:  # if sizes are not equal
+            size = (math.ceil(w0 * r), math.ceil(h0 * r)) if r != 1 else (w0, h0)  # resized wh
+            if im.shape[1::-1] != size:  # if sizes are not equal
                 interp = cv2.INTER_LINEAR if (self.augment or r > 1) else cv2.INTER_AREA
-                im = cv2.resize(im, (math.ceil(w0 * r), math.ceil(h0 * r)), interpolation=interp)
+                im = cv2.resize(im, size, interpolation=interp)
             return im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
         return self.ims[i], self.im_hw0[i], self.im_hw[i]  # im, hw_original, hw_resized
 
@@ -896,6 +896,8 @@ def non_max_suppression(
         labels=(),
         max_det=300,
         nm=0,  # number of masks
+        batched=False,  # filter the boxes of all images at once, with a single NMS call on GPU
+        torch_1_9=check_version(torch.__version__, '1.9.0'),  # stable sort
 ):
     """Non-Maximum Suppression (NMS) on inference results to reject overlapping detections
 
@@ -928,6 +930,55 @@ def non_max_suppression(
 
     t = time.time()
     mi = 5 + nc  # mask start index
+    if batched and bs > 1 and not (labels or merge) and torch_1_9:  # same results as the per-image loop below
+        bi, x = xc.nonzero(as_tuple=False)[:, 0], prediction[xc]  # image index, candidates of all images
+
+        # Compute conf
+        x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
+
+        # Detections matrix nx6 (xyxy, conf, cls)
+        box, mask = xywh2xyxy(x[:, :4]), x[:, mi:]
+        if multi_label:
+            i, j = (x[:, 5:mi] > conf_thres).nonzero(as_tuple=False).T
+            x, bi = torch.cat((box[i], x[i, 5 + j, None], j[:, None].float(), mask[i]), 1), bi[i]
+        else:  # best class only
+            conf, j = x[:, 5:mi].max(1, keepdim=True)
+            i = conf.view(-1) > conf_thres
+            x, bi = torch.cat((box, conf, j.float(), mask), 1)[i], bi[i]
+
+        # Filter by class
+        if classes is not None:
+            i = (x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)
+            x, bi = x[i], bi[i]
+
+        # Sort by image then confidence and remove excess boxes of each image
+        i = x[:, 4].sort(descending=True, stable=True)[1]
+        i = i[bi[i].sort(stable=True)[1]]
+        x, bi = x[i], bi[i]
+        n = torch.bincount(bi, minlength=bs)  # boxes per image
+        i = torch.arange(len(bi), device=x.device) - (n.cumsum(0) - n)[bi] < max_nms  # rank in image < max_nms
+        x, bi = x[i], bi[i]
+
+        # Batched NMS
+        c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
+        boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
+        if x.is_cuda:  # single NMS call, boxes also offset by image in float64 to keep their float32 values exact
+            i = torchvision.ops.nms(boxes.double() + bi[:, None] * (max_wh * (nc + 2.0)), scores.double(), iou_thres)
+            i = i[bi[i].sort(stable=True)[1]]  # by image, by confidence within each image
+            n = torch.bincount(bi[i], minlength=bs).tolist()  # detections per image
+            output = [x[j[:max_det]] for j in i.split(n)]  # limit detections
+            if (time.time() - t) > time_limit:
+                LOGGER.warning(f'WARNING ⚠️ NMS time limit {time_limit:.3f}s exceeded')
+        else:  # CPU NMS time grows with the square of the boxes of a call, so one call per image
+            n = torch.bincount(bi, minlength=bs).tolist()  # boxes per image
+            output = [torch.zeros((0, 6 + nm), device=x.device)] * bs
+            for xi, (xb, b, sc) in enumerate(zip(x.split(n), boxes.split(n), scores.split(n))):
+                output[xi] = xb[torchvision.ops.nms(b, sc, iou_thres)[:max_det]]  # NMS, limit detections
+                if (time.time() - t) > time_limit:
+                    LOGGER.warning(f'WARNING ⚠️ NMS time limit {time_limit:.3f}s exceeded')
+                    break  # time limit exceeded
+        return [xi.to(device) for xi in output] if mps else output
+
     output = [torch.zeros((0, 6 + nm), device=prediction.device)] * bs
     for xi, x in enumerate(prediction):  # image index, image inference
         # Apply constraints
@@ -974,7 +1025,10 @@ def non_max_suppression(
         n = x.shape[0]  # number of boxes
         if not n:  # no boxes
             continue
-        x = x[x[:, 4].argsort(descending=True)[:max_nms]]  # sort by confidence and remove excess boxes
+        if batched and torch_1_9:  # equal confidences in anchor order, like the batched branch
+            x = x[x[:, 4].sort(descending=True, stable=True)[1][:max_nms]]
+        else:
+            x = x[x[:, 4].argsort(descending=True)[:max_nms]]  # sort by confidence and remove excess boxes
 
         # Batched NMS
         c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
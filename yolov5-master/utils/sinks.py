@@ -0,0 +1,165 @@
+# YOLOv5 🚀 by Ultralytics, GPL-3.0 license
+"""
+Detection output sinks for detect.py
+"""
+
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from utils.general import xyxy2xywh
+
+
+class DetectionSink(ABC):
+    """
+    Receives the detections of detect.run once per image, with all the boxes of the image at once
+    """
+
+    @abstractmethod
+    def write(self, path, frame, det, names, shape):
+        """
+        Write the detections of an image
+
+        Args:
+            path:   Path of the image (or video/stream) source
+            frame:  Frame index of a video or stream, None for images
+            det:    (n, 6) tensor of [x1, y1, x2, y2, conf, cls] boxes in original image pixels
+            names:  Class names of the model
+            shape:  Original image shape (h, w, c)
+        """
+
+    def close(self):
+        pass
+
+    def summary(self):
+        return ''
+
+    @staticmethod
+    def counts(det, names):
+        # Number of detections per class index, for every class of the model
+        return torch.bincount(det[:, 5].long(), minlength=len(names)).tolist()
+
+
+class TxtSink(DetectionSink):
+    """
+    Writes YOLO-format labels/<stem>.txt files, one line per box, opening each file once per image
+    """
+
+    def __init__(self, save_dir, save_conf=False):
+        self.labels_dir = Path(save_dir) / 'labels'
+        self.labels_dir.mkdir(parents=True, exist_ok=True)
+        self.save_conf = save_conf  # add the confidence as a 6th column
+
+    def write(self, path, frame, det, names, shape):
+        if not len(det):
+            return
+        txt_path = self.labels_dir / (Path(path).stem + ('' if frame is None else f'_{frame}'))
+        gn = torch.tensor(shape)[[1, 0, 1, 0]]  # normalization gain whwh
+        det = det.flip(0)  # same box order as the per-box writer
+        xywh = (xyxy2xywh(det[:, :4].clone()) / gn.to(det.device)).tolist()  # normalized xywh
+        lines = []
+        for box, conf, cls in zip(xywh, det[:, 4].tolist(), det[:, 5].tolist()):
+            line = (cls, *box, conf) if self.save_conf else (cls, *box)  # label format
+            lines.append(('%g ' * len(line)).rstrip() % line + '\n')
+        with open(f'{txt_path}.txt', 'a') as f:
+            f.writelines(lines)
+
+    def summary(self):
+        return f"{len(list(self.labels_dir.glob('*.txt')))} labels saved to {self.labels_dir}"
+
+
+class JsonlSink(DetectionSink):
+    """
+    Writes one buffered JSON line per image to a single file: boxes, confidences, classes and per-class counts
+    """
+
+    def __init__(self, file):
+        self.file = Path(file)
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(self.file, 'w', buffering=1 << 20)
+        self.n = 0
+
+    def write(self, path, frame, det, names, shape):
+        det = det.cpu()
+        record = {
+            'image': str(path),
+            'frame': frame,
+            'shape': list(shape[:2]),
+            'boxes': det[:, :4].tolist(),  # xyxy pixels
+            'conf': det[:, 4].tolist(),
+            'cls': det[:, 5].int().tolist(),
+            'counts': self.counts(det, names)}
+        self.f.write(json.dumps(record) + '\n')
+        self.n += 1
+
+    def close(self):
+        self.f.close()
+
+    def summary(self):
+        return f'{self.n} images saved to {self.file}'
+
+
+class NumpySink(DetectionSink):
+    """
+    Collects the detections of all images and saves them to a single .npz file when closed
+
+    Arrays: images (n,), frames (n,) (-1 for images), shapes (n, 2), offsets (n + 1,) into det,
+    det (m, 6) [x1, y1, x2, y2, conf, cls] and counts (n, nc), so the boxes of image i are det[offsets[i]:offsets[i + 1]]
+    """
+
+    def __init__(self, file):
+        self.file = Path(file)
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self.images, self.frames, self.shapes, self.dets, self.class_counts = [], [], [], [], []
+
+    def write(self, path, frame, det, names, shape):
+        self.images.append(str(path))
+        self.frames.append(-1 if frame is None else frame)
+        self.shapes.append(shape[:2])
+        self.dets.append(det.cpu().numpy().astype(np.float32))
+        self.class_counts.append(self.counts(det, names))
+
+    def close(self):
+        offsets = np.cumsum([0] + [len(x) for x in self.dets])
+        np.savez(self.file,
+                 images=np.array(self.images, dtype=str),
+                 frames=np.array(self.frames, dtype=np.int64),
+                 shapes=np.array(self.shapes, dtype=np.int64).reshape(-1, 2),
+                 offsets=offsets,
+                 det=np.concatenate(self.dets) if self.dets else np.zeros((0, 6), dtype=np.float32),
+                 counts=np.array(self.class_counts, dtype=np.int64))
+
+    def summary(self):
+        return f'{len(self.images)} images saved to {self.file}'
+
+
+class CallbackSink(DetectionSink):
+    """
+    Calls callback(path, frame, det, counts) in-process for every image, e.g. to count slots without writing files
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, path, frame, det, names, shape):
+        self.callback(path, frame, det, self.counts(det, names))
+
+
+SINKS = {'txt': TxtSink, 'jsonl': JsonlSink, 'npz': NumpySink}
+
+
+def create_sink(sink, save_dir, save_conf=False):
+    # Create a detection sink from its name in SINKS, or return the given DetectionSink instance or callback
+    if sink is None or isinstance(sink, DetectionSink):
+        return sink
+    if isinstance(sink, type):
+        raise TypeError(f'sink must be a DetectionSink instance, not the class {sink.__name__}')
+    if callable(sink):
+        return CallbackSink(sink)
+    assert sink in SINKS, f'invalid sink {sink}, valid sinks are {list(SINKS)}'
+    if sink == 'txt':
+        return TxtSink(save_dir, save_conf=save_conf)
+    return SINKS[sink](Path(save_dir) / f'detections.{sink}')